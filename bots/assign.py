@@ -0,0 +1,112 @@
+"""Conflict-free move assignment for a whole team
+
+Every robot proposes the cells it would like to end the turn on, best
+first, each with a cost. assign() hands out cells so that no two robots
+share one and the total cost is as small as possible: a min-cost
+bipartite matching, solved with successive shortest augmenting paths
+(Dijkstra with potentials) over just the proposed edges. A team of a few
+dozen robots with a handful of cells each takes around a millisecond.
+"""
+import heapq
+
+
+def assign(proposals):
+    """{robot: cell} from {robot: [(cell, cost), ...]}
+
+    Costs must not be negative. Every robot needs a cell no one else
+    proposes (its own location, for staying put) so that everyone can
+    be given something; ValueError otherwise. Robots are matched in
+    sorted order, so equal-cost answers are always broken the same way.
+    """
+    options = {}
+    for robot, cells in proposals.items():
+        best = {}
+        for cell, cost in cells:
+            if cell not in best or cost < best[cell]:
+                best[cell] = cost
+        options[robot] = sorted(best.items())
+
+    robot_pot = dict.fromkeys(options, 0)
+    cell_pot = {}
+    owner = {}      # cell -> robot
+    given = {}      # robot -> cell
+
+    for start in sorted(options):
+        # Dijkstra over cells on reduced costs, from the unmatched robot
+        # to the nearest cell no one holds yet
+        settled = {}
+        came_from = {}
+        queue = [(cost - robot_pot[start] - cell_pot.get(cell, 0), cell,
+                  start) for cell, cost in options[start]]
+        heapq.heapify(queue)
+        free = None
+        while queue:
+            dist, cell, robot = heapq.heappop(queue)
+            if cell in settled:
+                continue
+            settled[cell] = dist
+            came_from[cell] = robot
+            if cell not in owner:
+                free = cell
+                break
+            holder = owner[cell]
+            for other, cost in options[holder]:
+                if other not in settled:
+                    reduced = (cost - robot_pot[holder] -
+                               cell_pot.get(other, 0))
+                    heapq.heappush(queue, (dist + reduced, other, holder))
+        if free is None:
+            raise ValueError("no cell left for robot {r}".format(r=start))
+
+        # keep every reduced cost non-negative and the matched edges tight
+        shortest = settled[free]
+        robot_pot[start] += shortest
+        for cell, dist in settled.items():
+            if cell != free:
+                gap = shortest - dist
+                cell_pot[cell] = cell_pot.get(cell, 0) - gap
+                robot_pot[owner[cell]] += gap
+
+        # flip the matching along the path
+        cell = free
+        while True:
+            robot = came_from[cell]
+            previous = given.get(robot)
+            given[robot] = cell
+            owner[cell] = robot
+            if robot == start:
+                break
+            cell = previous
+    return given
+
+
+def cycles(moves):
+    """Robots in moves ({location: destination}, movers only) that would
+    have to move through each other: swaps and longer rings of robots
+    each moving into the next one's cell. The game lets none of them
+    move."""
+    stuck = set()
+    done = set()
+    for loc in sorted(moves):
+        path = []
+        on_path = set()
+        at = loc
+        while at in moves and at not in done and at not in on_path:
+            path.append(at)
+            on_path.add(at)
+            at = moves[at]
+        if at in on_path:
+            stuck.update(path[path.index(at):])
+        done.update(path)
+    return stuck
+
+
+def stuck(moves):
+    """cycles(), plus every robot whose way is blocked by one of them"""
+    blocked = cycles(moves)
+    while True:
+        waiting = set(loc for loc, dest in moves.items()
+                      if loc not in blocked and dest in blocked)
+        if not waiting:
+            return blocked
+        blocked |= waiting
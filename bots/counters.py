@@ -0,0 +1,112 @@
+"""Profiling counters: which decision branches fire, and where time goes
+
+Branches are counted at the point a bot knows which one decided a move:
+
+    if counters.enabled:
+        counters.branch('chase', elapsed)
+
+Helpers are registered once with instrument(). They are only wrapped
+with a timer while counting is on, so with it off (the default) they
+cost exactly what they did before. Counts and times add up until
+clear(), e.g. over a whole match, and report() flattens them into one
+dict that adds up across processes with merge().
+
+Times are inclusive: a branch's time covers the helpers it called, and
+a helper that calls another helper counts the inner one's time too.
+"""
+import collections
+import functools
+import time
+
+enabled = False
+_counts = collections.Counter()
+_seconds = collections.Counter()
+_helpers = []       # (class, attribute name)
+_originals = {}
+
+
+def enable():
+    global enabled
+    enabled = True
+    for cls, name in _helpers:
+        wrap(cls, name)
+
+
+def disable():
+    global enabled
+    enabled = False
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+def clear():
+    _counts.clear()
+    _seconds.clear()
+
+
+def branch(name, seconds):
+    """One move decided by branch name, after seconds of thinking"""
+    _counts['branch.' + name] += 1
+    _seconds['branch.' + name] += seconds
+
+
+def instrument(cls, *names):
+    """Time calls to these methods of cls whenever counting is on"""
+    for name in names:
+        _helpers.append((cls, name))
+        if enabled:
+            wrap(cls, name)
+
+
+def wrap(cls, name):
+    if (cls, name) in _originals:
+        return
+    original = cls.__dict__[name]
+    key = 'helper.{c}.{n}'.format(c=cls.__name__, n=name)
+
+    @functools.wraps(original)
+    def timed(*args, **kwargs):
+        start = time.time()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            _counts[key] += 1
+            _seconds[key] += time.time() - start
+
+    _originals[(cls, name)] = original
+    setattr(cls, name, timed)
+
+
+def report():
+    """{'<kind>.<name>.calls': n, '<kind>.<name>.seconds': s} for every
+    branch and helper seen since the last clear()"""
+    flat = {}
+    for key, count in _counts.items():
+        flat[key + '.calls'] = count
+        flat[key + '.seconds'] = _seconds[key]
+    return flat
+
+
+def merge(total, flat):
+    """Adds one report() into another, e.g. from each match of a batch"""
+    for key, value in flat.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def write_report(flat, out):
+    """Tab separated rows, most time first: name, calls, seconds, mean
+    microseconds per call and share of all branch time"""
+    names = sorted(set(k.rsplit('.', 1)[0] for k in flat))
+    branch_total = sum(flat[n + '.seconds'] for n in names
+                       if n.startswith('branch.')) or 1.0
+    rows = [(flat[n + '.seconds'], n) for n in names]
+    out.write('name\tcalls\tseconds\tmean_us\tshare\n')
+    for seconds, name in sorted(rows, reverse=True):
+        calls = flat[name + '.calls']
+        share = ''
+        if name.startswith('branch.'):
+            share = '{0:.1%}'.format(seconds / branch_total)
+        out.write('{n}\t{c}\t{s:.4f}\t{m:.1f}\t{p}\n'.format(
+            n=name, c=calls, s=seconds, m=seconds * 1e6 / calls, p=share))
@@ -1,139 +1,116 @@
 import rg
 import math
 
+import maptables
+import sim
+import tracing
+from influence import InfluenceMap
+from pathing import Pathfinder
+from predict import Forecast
+from worldmodel import WorldModel
+from worldview import WorldView
+
 class Robot(object):
     """Fry! My first crack at robotgame
     http://robotgame.org/viewrobot/4184
     """
     MAX_HP = 50
     AVG_DAMAGE = 9
+    # What a robot is worth beyond its hp when simulating a turn
+    KILL_VALUE = 20
     GATHERING = rg.CENTER_POINT
 
     # Behavior constants
     CHASE_DIST_THRESH = 5
-
-    SILENT = False
+    # A lone enemy at or below SUICIDE_GUESS_HP is expected to blow itself
+    # up. We step away, except every HOLD_EVERY'th turn.
+    SUICIDE_GUESS_HP = 8
+    HOLD_EVERY = 5
+    # Attack an empty cell when an enemy is at least this likely to step in
+    EMPTY_ATTACK_CHANCE = 0.3
 
     def act(self, game):
         self.g = game
-        self.print_turn()
-        self.surrounding = rg.locs_around(self.location,
-                                          filter_out=('invalid', 'obstacle'))
-        enemies = [r for _, r in self.g['robots'].items()
-                   if not self.on_team(r)]
-        self.say("{n} enemies alive this turn".format(n=len(enemies)))
+        # patches this turn's grid, influence and paths from last turn's
+        model = WorldModel.for_game(game, self.player_id, self.AVG_DAMAGE)
+        self.view = WorldView.for_game(game, self.player_id)
+        self.forecast = Forecast.for_game(game, self.player_id, model)
+        self.grid = self.view.grid
+        self.influence = InfluenceMap.for_game(game, self.player_id,
+                                               self.AVG_DAMAGE)
+        self.surrounding = maptables.tables().neighbors_of(self.location)
+        branch, move = self.decide()
+        if tracing.enabled:
+            tracing.record(self.g['turn'], self.location, branch, move,
+                           hp=self.hp,
+                           enemies=self.influence.enemies_near(self.location))
+        return move
+
+    def decide(self):
+        """Returns (name of the branch that decided, move)"""
         neighbors = self.nearby_robots(self.location)
-        self.say("saw {n} nearby robots".format(n=len(neighbors)))
         neighbor_enemies = [r for r in neighbors
                             if not self.on_team(r)]
-        self.say("saw {n} neighbor_enemies".format(n=len(neighbor_enemies)))
 
         # Suicide?
         if self.should_suicide(neighbor_enemies):
-            self.say("committing suicide - {e} neighbor_enemies / {hp} hp left"
-                     .format(e=len(neighbor_enemies), hp=self.hp))
-            return ['suicide']
+            return 'suicide', ['suicide']
 
         to_gathering = self.step_toward(self.location, self.GATHERING)
         # On a spawn point?
         if self.on_spawn_unsafe():
             if to_gathering:
-                self.say("unsafe on spawn point! running!")
-                return ['move', to_gathering]
+                return 'spawn_run', ['move', to_gathering]
             else:
-                self.say("can't get off spawn point, exploding")
-                return ['suicide']
+                return 'spawn_suicide', ['suicide']
 
         # Run?
         if self.should_run(neighbor_enemies):
-            self.say("trying to run")
             run_to = self.find_escape(neighbors)
             if run_to:
-                self.say("found escape {l} going to it".format(l=run_to))
-                return ['move', run_to]
+                return 'run', ['move', run_to]
 
         # Attack?
         target = self.choose_target(neighbor_enemies)
         if target:
-            self.say("attacking {l}".format(l=target.location))
-            return ['attack', target.location]
+            return 'attack', ['attack', target.location]
 
         # Nearby enemy?
-        nearest_enemy, enemy_distance = \
-           self.nearest_enemy(self.location, enemies)
-        self.say("Nearest enemy is {d} away".format(d=enemy_distance))
+        nearest_enemy, enemy_distance = self.nearest_enemy(self.location)
         if self.should_chase(nearest_enemy, enemy_distance):
-            self.say("try to chase enemy @ {l}".format(l=nearest_enemy.location))
             to_enemy = self.step_toward(self.location,
                                         nearest_enemy.location)
             if to_enemy:
-                return ['move', to_enemy]
+                return 'chase', ['move', to_enemy]
 
         # Attack where an enemy is about to move?
-        empty_attack_space = self.should_attack_empty(nearest_enemy, enemy_distance)
+        empty_attack_space = self.should_attack_empty()
         if empty_attack_space:
-            self.say("attacking {e} where enemy might move"
-                     .format(e=empty_attack_space))
-            return ['attack', empty_attack_space]
+            return 'empty_attack', ['attack', empty_attack_space]
 
         # Otherwise, go to the gathering point
         if to_gathering:
-            self.say("moving towards gathering")
-            return ['move', to_gathering]
+            return 'gather', ['move', to_gathering]
 
-        self.say("didn't move or attack, guarding")
-        return ['guard']
+        return 'guard', ['guard']
 
     def step_toward(self, loc, dest):
-        """Ant navigation with basic block checking
+        """Shortest path navigation around walls and other robots
         Returns a move destination or None"""
-        x0, y0 = loc
-        x, y = dest
-        x_diff, y_diff = x - x0, y - y0
-        dx, dy = abs(x_diff), abs(y_diff)
-
-        self.say("from {l} to {d}: delta={t}"
-                 .format(l=loc, d=dest, t=(dx,dy)))
-
-        forward_x = (self.add_sign(x0, x_diff), y0)
-        forward_y = (x0, self.add_sign(y0, y_diff))
-
-        can_x = not self.is_blocked(forward_x) and dx > 0
-        can_y = not self.is_blocked(forward_y) and dy > 0
-
-        # Both open, take bigger vector first
-        if can_x and can_y:
-            if dx > dy:
-                return forward_x
-            return forward_y
-        elif can_x:
-            return forward_x
-        elif can_y:
-            return forward_y
-        return None
-
-    def add_sign(self, num, diff):
-        if diff > 0:
-            return num + 1
-        elif diff < 0:
-            return num - 1
-        else:
-            return num
+        paths = Pathfinder.for_game(self.g)
+        return paths.next_step(loc, (dest,), self.is_blocked)
 
     def is_blocked(self, dest):
         if not dest:
             return True
         if dest in self.g.robots:
             return True
-        filter = set(['invalid', 'obstacle'])
-        if len(filter & set(rg.loc_types(dest))) != 0:
+        if not maptables.tables().is_walkable(dest):
             return True
         return False
 
     def nearby_robots(self, center):
-        locs = rg.locs_around(center)
-        return [bot for loc, bot in self.g['robots'].items()
-                if loc in locs]
+        return self.grid.around(center)
 
     def choose_target(self, robots):
         """Always attack the weakest robot"""
@@ -145,16 +122,8 @@ class Robot(object):
                 min_hp = r.hp
         return target
 
-    def nearest_enemy(self, location, enemies):
-        nearest = None
-        nearest_dist = -1
-        for robot in enemies:
-            robot_walk_dist = rg.wdist(robot.location, location)
-            if robot_walk_dist < nearest_dist \
-                or nearest_dist == -1:
-                nearest_dist = robot_walk_dist
-                nearest = robot
-        return nearest, nearest_dist
+    def nearest_enemy(self, location):
+        return self.view.nearest_enemy(location)
 
     def should_chase(self, enemy, nearest_dist):
         weak = enemy.hp <= self.AVG_DAMAGE * 2 \
@@ -162,18 +131,18 @@ class Robot(object):
         close = nearest_dist < self.CHASE_DIST_THRESH
         return close and weak
 
-    def should_attack_empty(self, enemy, nearest_dist):
-        if nearest_dist == 2:
-            self.say("Defensive attack: us={us},them={them}"
-                     .format(us=self.location, them=enemy.location))
-            return self.step_toward(self.location, enemy.location)
-        return None
+    def should_attack_empty(self):
+        """The open cell next to us an enemy is likely to walk into"""
+        allowed = lambda loc: not self.is_blocked(loc)
+        return self.forecast.best_attack(self.location,
+                                         self.EMPTY_ATTACK_CHANCE, allowed)
 
     def should_run(self, enemies):
         """Run if the enemy is about to suicide or we're outnumbered"""
-        expecting_suicide = len(enemies) == 1 and enemies[0].hp <= 8
-        dodging_suicide = self.turn() % 5 != 0
-        too_many = len(enemies) > 1
+        expecting_suicide = len(enemies) == 1 and \
+          enemies[0].hp <= self.SUICIDE_GUESS_HP
+        dodging_suicide = self.turn() % self.HOLD_EVERY != 0
+        too_many = self.influence.enemies_near(self.location) > 1
         return (expecting_suicide and dodging_suicide) or too_many
 
     def find_escape(self, neighbors):
@@ -188,21 +157,50 @@ class Robot(object):
           self.on_spawn_point()
 
     def on_spawn_point(self):
-        return 'spawn' in rg.loc_types(self.location)
-
-    def should_suicide(self, neighbor_enemies):
-        return len(neighbor_enemies) * self.AVG_DAMAGE > self.hp
+        return maptables.tables().is_spawn(self.location)
+
+    def should_suicide(self, enemies):
+        """Would blowing up beat attacking once the enemies around us have
+        all hit us"""
+        if not enemies:
+            return False
+        if sim.np is None:
+            return self.influence.expected_damage(self.location) > self.hp
+        options = (['attack', self.choose_target(enemies).location],
+                   ['suicide'])
+        scores = sim.score_options(
+            sim.State.for_game(self.g), self.location, options,
+            [e.location for e in enemies], self.player_id, self.AVG_DAMAGE,
+            self.KILL_VALUE)
+        return scores.argmax() == 1
 
     def on_team(self, robot):
         return self.player_id == robot.player_id
 
-    def print_turn(self):
-        self.say("-- robot @ {l} [hp={hp}] starting turn {t} --"
-                 .format(l=self.location, hp=self.hp, t=self.turn()))
-
-    def say(self, what):
-        if not self.SILENT:
-            print what
-
     def turn(self):
         return self.g['turn'] + 1
+
+
+# Robot constants tools.tuner may change, and the ranges it tries
+PARAMS = {
+    'AVG_DAMAGE': (6, 12),
+    'KILL_VALUE': (0, 50),
+    'CHASE_DIST_THRESH': (2, 10),
+    'SUICIDE_GUESS_HP': (0, 20),
+    'HOLD_EVERY': (2, 10),
+    'EMPTY_ATTACK_CHANCE': (0.1, 0.6),
+}
+
+
+def defaults():
+    """The current values of PARAMS"""
+    return dict((name, getattr(Robot, name)) for name in PARAMS)
+
+
+def tuned(**params):
+    """A Robot class using params instead of the defaults"""
+    unknown = set(params) - set(PARAMS)
+    if unknown:
+        raise ValueError("fry can't tune {p}".format(
+            p=', '.join(sorted(unknown))))
+    return type('Tuned', (Robot,), params)
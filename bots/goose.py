@@ -1,17 +1,27 @@
+import collections
+import time
+
 import rg
 import settings as rgs
 
+import assign
+import counters
+import maptables
+import sim
+import tracing
+from grid import TurnCache
+from influence import InfluenceMap
+from pathing import Pathfinder
+from predict import Forecast
+from worldmodel import WorldModel
+from worldview import WorldView
+
 
 class GameWatcher(object):
-    SILENT = False
 
     def __init__(self, game=None):
         self.g = game
 
-    def say(self, what, prefix="   "):
-        if not self.SILENT:
-            print prefix + what
-
     def turn(self):
         return self.g['turn'] + 1
 
@@ -20,212 +30,420 @@ class GameWatcher(object):
         next_spawn = self.turn() % rgs.settings.spawn_every
         return next_spawn == 1
 
+class PlanCache(object):
+    """Team plans shared between all of our robots
+
+    The first robot to act on a turn calculates moves for the whole team,
+    everyone after that just looks their move up. Plans are keyed by
+    (turn, player_id, board fingerprint) and the oldest are dropped once
+    there are more than max_plans of them.
+    """
+    MAX_PLANS = 4
+
+    _boards = TurnCache()
+
+    def __init__(self, max_plans=MAX_PLANS):
+        self.max_plans = max_plans
+        self.plans = collections.OrderedDict()
+
+    @classmethod
+    def key(cls, game, player_id):
+        # the fingerprint is the same for every robot on the turn
+        board = cls._boards.get(game, lambda: frozenset(
+            (loc, bot.player_id, bot.hp)
+            for loc, bot in game['robots'].items()))
+        return (game['turn'], player_id, board)
+
+    def get(self, key):
+        return self.plans.get(key)
+
+    def put(self, key, moves):
+        self.plans[key] = moves
+        while len(self.plans) > self.max_plans:
+            self.plans.popitem(last=False)
+
+    def invalidate(self, turn=None, player_id=None):
+        """Drop cached plans, optionally only those for a turn / player"""
+        for key in self.plans.keys():
+            k_turn, k_player, _ = key
+            if (turn is None or turn == k_turn) and \
+              (player_id is None or player_id == k_player):
+                del self.plans[key]
+
+    def __len__(self):
+        return len(self.plans)
+
+
 class Robot(GameWatcher):
-    """Goose! Every robot calculates a complete set of the next
-    turn's moves, and then returns the move for itself.
+    """Goose! The first robot to act calculates a complete set of the
+    next turn's moves, and every robot returns the move for itself.
     http://robotgame.org/viewrobot/8130
     """
+    plans = PlanCache()
+
+    # Seconds the team plan may take before the remaining robots keep
+    # their safe default moves. Off by default: with a budget, which
+    # robots get planned depends on how fast the machine is, so the same
+    # board can get different moves. None means always finish the plan.
+    PLAN_BUDGET = None
 
     def act(self, game):
         """Method called by the game controller"""
         self.g = game
-        brain = RobotBrain(game).setup_turn(self)
-        moves = brain.calculate_moves()
-
-        if brain.is_debug_robot():
-            self.print_turn()
-            self.say("Move debugger: {m}".format(m=moves))
+        key = PlanCache.key(game, self.player_id)
+        moves = self.plans.get(key)
+        if moves is None:
+            deadline = None
+            if self.PLAN_BUDGET is not None:
+                deadline = time.time() + self.PLAN_BUDGET
+            brain = self.make_brain(game).setup_turn(self)
+            moves = brain.calculate_moves(deadline)
+            self.plans.put(key, moves)
+
+            if tracing.enabled:
+                tracing.record(self.g['turn'], self.location, 'plan',
+                               **brain.report)
         my_move = moves[self.location]
 
         return my_move
 
-    def print_turn(self):
-        self.say("-- Goose: robot @ {l} [hp={hp}] starting turn {t} --"
-                 .format(l=self.location, hp=self.hp, t=self.turn()),
-                 prefix="")
+    def make_brain(self, game):
+        return RobotBrain(game)
 
 
 class RobotBrain(GameWatcher):
     """A master controller that makes a set of moves for all robots"""
 
     AVG_DAMAGE = 9
-
-    def say(self, what, prefix="   "):
-        if self.is_debug_robot():
-            super(RobotBrain, self).say(what, prefix)
+    SUPPORT_RADIUS = 2
+    # An enemy with more than SUPPORT_FRIENDS of our robots within
+    # SUPPORT_RADIUS counts as under attack
+    SUPPORT_FRIENDS = 2
+    # Chase the enemy with the lowest TARGET_DIST_WEIGHT * distance + hp
+    TARGET_DIST_WEIGHT = 4
+    # What a robot is worth beyond its hp when simulating a turn
+    KILL_VALUE = 20
+    # Attack an empty cell when an enemy is at least this likely to step in
+    EMPTY_ATTACK_CHANCE = 0.25
+
+    # Hand out the whole team's cells in one matching instead of letting
+    # robots reserve them one at a time. Every step down a robot's list
+    # of cells costs RANK_COST, staying put costs STAY_COST, or
+    # PANIC_COST when the robot is running for its life.
+    ASSIGN_MOVES = True
+    RANK_COST = 1
+    STAY_COST = 3
+    PANIC_COST = 10
 
     def setup_turn(self, robot):
         self.robot = robot
         self.nav = Navigator(self.g)
-
-        self.enemies = []
-        self.friends = []
-        for loc, bot in self.g['robots'].items():
-            pair = (loc, bot)
-            if self.on_team(bot):
-                self.friends.append(pair)
-            else:
-                self.enemies.append(pair)
-        self.friends.sort()
+        self.wishes = {}
+        # patches this turn's grid, influence and paths from last turn's
+        model = WorldModel.for_game(self.g, robot.player_id,
+                                    self.AVG_DAMAGE)
+        view = WorldView.for_game(self.g, robot.player_id)
+        self.forecast = Forecast.for_game(self.g, robot.player_id, model)
+        self.grid = view.grid
+        self.influence = InfluenceMap.for_game(self.g, robot.player_id,
+                                               self.AVG_DAMAGE)
+
+        # both in location order, so the plan doesn't depend on the
+        # robots dict's order
+        self.friends = view.friends
+        self.enemies = view.enemies
+        if self.ASSIGN_MOVES:
+            # the assignment decides who actually gets a friend's cell
+            self.nav.passable = frozenset(bot.location
+                                          for bot in self.friends)
         return self
 
-    def calculate_moves(self):
+    def calculate_moves(self, deadline=None):
         """Calculates moves for all robots, and returns them in a map
-        Robot loc -> [move list]"""
+        Robot loc -> [move list]
+
+        With a deadline (a time.time() value) every robot starts with a
+        cheap safe move, then robots get the full analysis in priority
+        order until time runs out. self.report says how many made it."""
         moves = {}
 
-        for loc, bot in self.friends:
-            self.say("Finding move for robot at {l}".format(l=loc), prefix=" ")
-
-            enemies_under_attack = [e for _, e in self.enemies
-                                    if self.under_attack(e, bot)]
-
-            if self.nav.is_spawn_point(loc) and self.incoming_spawns():
-                spawn_escape = self.nav.find_escape(loc)
-                if spawn_escape:
-                    away = self.nav.step_toward(loc, spawn_escape)
-                    if away:
-                        self.say("escaping spawn")
-                        self.nav.add_destination(loc, away)
-                        moves[loc] = ['move', away]
-                else:
-                    self.say("suicide (trapped on spawn)")
-                    moves[loc] = ['suicide']
-
-            # TODO: better breaking between moves
-            if loc in moves:
-                continue
-
-            # See if we should attack or run away from a current enemy
-            neighbor_enemies = self.nearby_robots(loc, allies=False)
-            if neighbor_enemies:
-                attacked_neighbors = [e for e in neighbor_enemies if
-                                      e in enemies_under_attack]
-
-                if not attacked_neighbors or len(neighbor_enemies) > 1 or \
-                    self.expecting_suicide(neighbor_enemies):
-                    self.say("trying to escape")
-
-                    escape_safe = lambda e: self.safe_escape(e, neighbor_enemies)
-                    escape = self.nav.step_toward(loc,
-                                                  self.nav.find_escape(loc, escape_safe))
-                    if escape:
-                        self.say("successful escape")
-                        self.nav.add_destination(loc, escape)
-                        moves[loc] = ['move', escape]
-                    elif len(neighbor_enemies) > 1:
-                        # last ditch suicide
-                        for e in neighbor_enemies:
-                            low_hp = len(neighbor_enemies) * self.AVG_DAMAGE >= bot.hp
-                            if e.hp <= rgs.settings.suicide_damage or low_hp:
-                                self.say("suicide (surrounded) :-(")
-                                moves[loc] = ['suicide']
-
-                    if not loc in moves:
-                        # attack because we can't escape and didn't suicide
-                        self.say("attack unfavorably - can't escape")
-                        moves[loc] = ['attack',
-                                      self.choose_target(neighbor_enemies).location]
-                else:
-                    target = self.choose_target(attacked_neighbors)
-                    if target:
-                        self.say("attacking enemy @ {e}".format(e=target.location))
-                        moves[loc] = ['attack', target.location]
-
-            # TODO: better breaking between moves
-            if loc in moves:
-                continue
-
-            # Look for an enemy to go towards & attack
-            best_target = None
-            best_score = 9999
-            for e in enemies_under_attack:
-                dist = rg.wdist(loc, e.location)
-                score = (4 * dist) + e.hp
-                if score <= best_score:
-                    towards_enemy = self.nav.step_toward(loc, e.location)
-                    enemies_at_dest = len(self.nearby_robots(towards_enemy,
-                                                             allies=False))
-                    if enemies_at_dest <= 1:
-                        best_target = e
-                        best_score = score
-
-            if best_target:
-                towards_enemy = self.nav.step_toward(loc, best_target.location)
-                if rg.wdist(loc, best_target.location) <= 1:
-                    self.say("bug - attacking late")
-                    moves[loc] = ['attack', best_target.location]
-                elif towards_enemy:
-                    self.say("moving towards enemy")
-                    self.nav.add_destination(loc, towards_enemy)
-                    moves[loc] = ['move', towards_enemy]
-
-            # TODO: better breaking between moves
-            if loc in moves:
-                continue
-
-            # defensive attack towards a space an enemy might move?
-            for e_loc, e in self.enemies:
-                if rg.wdist(loc, e_loc) == 2:
-                    towards_empty = self.nav.step_toward(loc, e_loc)
-                    if towards_empty:
-                        self.say("attacking empty space")
-                        moves[loc] = ['attack', towards_empty]
-                        break
-
-            # don't stay on spawn points. they're a dumb place to stay
-            if not loc in moves:
-                if self.nav.is_spawn_point(loc):
-                    spawn_escape = self.nav.find_escape(loc)
-                    if spawn_escape:
-                        moves[loc] = ['move', spawn_escape]
+        if deadline is None:
+            for bot in self.friends:
+                self.plan(bot.location, bot, moves)
+            analyzed = len(self.friends)
+        else:
+            analyzed = self.plan_until(deadline, moves)
+
+        self.report = {'robots': len(self.friends), 'analyzed': analyzed}
+        if self.ASSIGN_MOVES:
+            self.report['reassigned'] = self.assign_moves(moves)
+        return moves
+
+    def plan_until(self, deadline, moves):
+        """Plans as many robots as fit before deadline, returns how many"""
+        # Safe defaults: escaping a spawn point is all the full analysis
+        # would do too, everyone else guards until they're looked at
+        pending = []
+        for bot in self.friends:
+            loc = bot.location
+            if counters.enabled:
+                start = time.time()
+            branch = self.escape_spawn(loc, moves)
+            if branch:
+                if counters.enabled:
+                    counters.branch(branch, time.time() - start)
+                self.traced(loc, bot, branch, moves)
             else:
-                # sanity check - don't move onto our own location
-                if moves[loc] == ['move', loc]:
-                    self.say("bug - tried to move onto ourself")
-                    moves[loc] = ['guard']
-
-            # still nothing? guard to be safe
-            if not loc in moves:
-                self.say("guarding - probably not good")
                 moves[loc] = ['guard']
+                pending.append(bot)
+        analyzed = len(self.friends) - len(pending)
+
+        for bot in self.by_priority(pending):
+            loc = bot.location
+            if time.time() >= deadline:
+                if tracing.enabled:
+                    tracing.record(self.g['turn'], loc, 'out_of_time',
+                                   moves[loc])
+                break
+            del moves[loc]
+            self.plan(loc, bot, moves)
+            analyzed += 1
+        return analyzed
+
+    def assign_moves(self, moves):
+        """Resolves every robot's wished-for cells at once, so that no two
+        robots collide and nobody walks into a robot coming the other way.
+        Returns how many robots didn't get their first choice."""
+        # a cell one of us attacks is no place to move into
+        attacked = set(m[1] for m in moves.values() if m[0] == 'attack')
+        proposals = dict((bot.location, [(bot.location, 0)])
+                         for bot in self.friends)
+        for loc, (cells, stay_cost) in self.wishes.items():
+            cells = [c for c in cells if c not in attacked]
+            proposals[loc] = [(c, i * self.RANK_COST)
+                              for i, c in enumerate(cells)]
+            proposals[loc].append((loc, stay_cost))
+
+        given = assign.assign(proposals)
+        movers = dict((loc, cell) for loc, cell in given.items()
+                      if cell != loc)
+        for loc in assign.stuck(movers):
+            del movers[loc]
+
+        reassigned = 0
+        for loc, (cells, _) in sorted(self.wishes.items()):
+            move = ['move', movers[loc]] if loc in movers else ['guard']
+            if move != ['move', cells[0]]:
+                reassigned += 1
+                if tracing.enabled:
+                    tracing.record(self.g['turn'], loc, 'reassigned', move,
+                                   wanted=cells[0])
+            moves[loc] = move
+        return reassigned
+
+    def move(self, loc, cells, moves, stay_cost=None):
+        """Moves loc to the first of cells. When moves are assigned the
+        rest are fallbacks, best first, in case another robot gets it."""
+        moves[loc] = ['move', cells[0]]
+        if self.ASSIGN_MOVES:
+            if stay_cost is None:
+                stay_cost = self.STAY_COST
+            self.wishes[loc] = (cells, stay_cost)
+        else:
+            self.nav.add_destination(loc, cells[0])
+
+    def by_priority(self, robots):
+        """Robots touching an enemy first, then ones an enemy could reach,
+        then everyone else"""
+        def priority(bot):
+            loc = bot.location
+            if self.influence.enemies_near(loc):
+                return 0
+            if self.grid.count_around(loc, self.robot.player_id,
+                                      allies=False, radius=2):
+                return 1
+            return 2
+        return sorted(robots, key=priority)
+
+    def plan(self, loc, bot, moves):
+        if counters.enabled:
+            start = time.time()
+        branch = self.plan_robot(loc, bot, moves)
+        if counters.enabled:
+            counters.branch(branch, time.time() - start)
+        self.traced(loc, bot, branch, moves)
+
+    def traced(self, loc, bot, branch, moves):
+        if tracing.enabled:
+            tracing.record(self.g['turn'], loc, branch, moves[loc], hp=bot.hp,
+                           enemies=self.influence.enemies_near(loc),
+                           friends=self.influence.friends_near(loc))
+
+    def escape_spawn(self, loc, moves):
+        """Get off a spawn point before new robots arrive on it. Returns
+        the branch taken if that decided our move."""
+        if self.nav.is_spawn_point(loc) and self.incoming_spawns():
+            escapes = self.nav.find_escapes(loc)
+            if escapes:
+                self.move(loc, escapes, moves, self.PANIC_COST)
+                return 'spawn_escape'
+            moves[loc] = ['suicide']
+            return 'spawn_suicide'
+        return None
 
-        return moves
+    def plan_robot(self, loc, bot, moves):
+        """Fully analyzes a single robot's move and stores it in moves.
+        Returns the name of the branch that decided it."""
+        enemies_under_attack = [e for e in self.enemies
+                                if self.under_attack(e, bot)]
+
+        branch = self.escape_spawn(loc, moves)
+        if branch:
+            return branch
+
+        # See if we should attack or run away from a current enemy
+        neighbor_enemies = self.nearby_robots(loc, allies=False)
+        if neighbor_enemies:
+            attacked_neighbors = [e for e in neighbor_enemies if
+                                  e in enemies_under_attack]
+
+            if not attacked_neighbors or len(neighbor_enemies) > 1 or \
+                self.expecting_suicide(neighbor_enemies):
+                escape_safe = lambda e: self.safe_escape(e, neighbor_enemies)
+                escapes = self.nav.find_escapes(loc, escape_safe)
+                if escapes:
+                    branch = 'escape'
+                    self.move(loc, escapes, moves, self.PANIC_COST)
+                elif len(neighbor_enemies) > 1:
+                    branch = self.last_stand(loc, bot, neighbor_enemies,
+                                             moves)
+
+                if not loc in moves:
+                    # attack because we can't escape and didn't suicide
+                    branch = 'unfavorable_attack'
+                    moves[loc] = ['attack',
+                                  self.choose_target(neighbor_enemies).location]
+            else:
+                target = self.choose_target(attacked_neighbors)
+                if target:
+                    branch = 'attack'
+                    moves[loc] = ['attack', target.location]
+
+        # TODO: better breaking between moves
+        if loc in moves:
+            return branch
+
+        # Look for an enemy to go towards & attack
+        best_target = None
+        best_score = 9999
+        for e in enemies_under_attack:
+            dist = rg.wdist(loc, e.location)
+            score = (self.TARGET_DIST_WEIGHT * dist) + e.hp
+            if score <= best_score:
+                towards_enemy = self.nav.step_toward(loc, e.location)
+                enemies_at_dest = len(self.nearby_robots(towards_enemy,
+                                                         allies=False))
+                if enemies_at_dest <= 1:
+                    best_target = e
+                    best_score = score
+
+        if best_target:
+            towards_enemy = self.nav.steps_toward(loc, best_target.location)
+            if rg.wdist(loc, best_target.location) <= 1:
+                branch = 'late_attack'
+                moves[loc] = ['attack', best_target.location]
+            elif towards_enemy:
+                branch = 'chase'
+                self.move(loc, towards_enemy, moves)
+
+        # TODO: better breaking between moves
+        if loc in moves:
+            return branch
+
+        # defensive attack towards a space an enemy might move?
+        towards_empty = self.forecast.best_attack(
+            loc, self.EMPTY_ATTACK_CHANCE, self.may_attack_empty)
+        if towards_empty:
+            branch = 'empty_attack'
+            moves[loc] = ['attack', towards_empty]
+
+        # don't stay on spawn points. they're a dumb place to stay
+        if not loc in moves:
+            if self.nav.is_spawn_point(loc):
+                escapes = self.nav.find_escapes(loc)
+                if escapes:
+                    branch = 'spawn_leave'
+                    self.move(loc, escapes, moves)
+        else:
+            # sanity check - don't move onto our own location
+            if moves[loc] == ['move', loc]:
+                branch = 'self_move_guard'
+                moves[loc] = ['guard']
+
+        # still nothing? guard to be safe
+        if not loc in moves:
+            branch = 'guard'
+            moves[loc] = ['guard']
+        return branch
+
+    def last_stand(self, loc, bot, enemies, moves):
+        """Surrounded with nowhere to run: attack, blow up or guard,
+        whichever leaves us best off once the enemies around us have all
+        hit us. Returns the branch taken."""
+        options = (
+            ('unfavorable_attack',
+             ['attack', self.choose_target(enemies).location]),
+            ('surrounded_suicide', ['suicide']),
+            ('surrounded_guard', ['guard']),
+        )
+        if sim.np is None:
+            # no simulator, go by the old rule of thumb
+            low_hp = self.influence.expected_damage(loc) >= bot.hp
+            weak = [e for e in enemies
+                    if e.hp <= rgs.settings.suicide_damage]
+            branch, move = options[1] if low_hp or weak else options[0]
+        else:
+            scores = sim.score_options(
+                sim.State.for_game(self.g), loc, [o[1] for o in options],
+                [e.location for e in enemies], self.robot.player_id,
+                self.AVG_DAMAGE, self.KILL_VALUE)
+            branch, move = options[scores.argmax()]
+        moves[loc] = move
+        return branch
 
     def nearby_robots(self, center, allies=True):
         if not center:
             return []
-        locs = rg.locs_around(center)
-        return [bot for loc, bot in self.g['robots'].items()
-                if loc in locs and
-                self.on_team(bot) == allies]
+        return self.grid.around(center, self.robot.player_id, allies)
 
     def under_attack(self, enemy, us=None):
-        attackers = self.nearby_robots(enemy.location, allies=True)
-        num_attacking = len(attackers)
-        if us in attackers:
+        num_attacking = self.influence.friends_near(enemy.location)
+        if us and rg.wdist(us.location, enemy.location) == 1:
             num_attacking -= 1
 
-        locs_around = self.nav.locs_around(enemy.location, radius=2)
-        friends_around = [self.g.robots[l] for l in locs_around
-                          if l in self.g.robots and self.on_team(self.g.robots[l])]
+        locs_around = maptables.tables().within(enemy.location,
+                                                self.SUPPORT_RADIUS)
+        friends_around = [self.grid.robot_at(l) for l in locs_around
+                          if self.grid.owner_at(l) == self.robot.player_id]
         num_friends = len(friends_around)
         if us in friends_around:
             num_friends -= 1
 
-        return num_attacking > 0 or num_friends > 2
+        return num_attacking > 0 or num_friends > self.SUPPORT_FRIENDS
+
+    def may_attack_empty(self, loc):
+        """Not a cell one of our robots may move into or still be on"""
+        return not self.nav.is_blocked(loc) and loc not in self.nav.passable
 
     def safe_escape(self, escape, current_enemies):
         """Return True if the locations looks safe to flee too"""
-        enemies_around_escape = self.nearby_robots(escape, allies=False)
-        return not self.expecting_suicide(enemies_around_escape) and \
-            len(enemies_around_escape) < len(current_enemies)
+        return not self.influence.suicide_threat(escape) and \
+            self.influence.enemies_near(escape) < len(current_enemies)
 
     def expecting_suicide(self, enemies):
         """Do we think one of these enemies will commit suicide"""
         for e in enemies:
-            friends_around = self.nearby_robots(e.location, allies=True)
-            if e.hp <= len(friends_around) * self.AVG_DAMAGE:
+            if self.influence.is_suicidal(e.location):
                 return True
         return False
 
@@ -242,14 +460,14 @@ class RobotBrain(GameWatcher):
     def on_team(self, robot):
         return self.robot.player_id == robot.player_id
 
-    def is_debug_robot(self):
-        return self.robot.location == self.friends[0][0]
-
 
 class Navigator(GameWatcher):
     """Handles point-to-point navigation for a single robot"""
     destinations = None
     departures = None
+    # Our robots' cells that may be stepped onto anyway, because the move
+    # assignment sorts out who really gets them
+    passable = frozenset()
 
     def add_destination(self, current, dest):
         """Record a space as a destination so we don't have robot collisions"""
@@ -262,39 +480,20 @@ class Navigator(GameWatcher):
             self.destinations.add(dest)
 
     def step_toward(self, loc, dest):
-        """Ant navigation with basic block checking
+        """Shortest path navigation around walls, robots and the spaces
+        our other robots are moving into
         Returns a move destination or None"""
         if not dest:
             return None
-        x0, y0 = loc
-        x, y = dest
-        x_diff, y_diff = x - x0, y - y0
-        dx, dy = abs(x_diff), abs(y_diff)
-
-        forward_x = (self.add_sign(x0, x_diff), y0)
-        forward_y = (x0, self.add_sign(y0, y_diff))
-
-        can_x = not self.is_blocked(forward_x) and dx > 0
-        can_y = not self.is_blocked(forward_y) and dy > 0
-
-        # Both open, take bigger vector first
-        if can_x and can_y:
-            if dx > dy:
-                return forward_x
-            return forward_y
-        elif can_x:
-            return forward_x
-        elif can_y:
-            return forward_y
-        return None
+        paths = Pathfinder.for_game(self.g)
+        return paths.next_step(loc, (dest,), self.is_blocked)
 
-    def add_sign(self, num, diff):
-        if diff > 0:
-            return num + 1
-        elif diff < 0:
-            return num - 1
-        else:
-            return num
+    def steps_toward(self, loc, dest):
+        """Like step_toward, but every useful step, best first"""
+        if not dest:
+            return []
+        paths = Pathfinder.for_game(self.g)
+        return paths.next_steps(loc, (dest,), self.is_blocked)
 
     def is_blocked(self, dest):
         if not dest:
@@ -303,41 +502,69 @@ class Navigator(GameWatcher):
             # Our robot is about to vacate this space
             if self.departures and dest in self.departures:
                 return False
-            return True
+            return dest not in self.passable
         # Our robot is about to move into this space, don't collide
         if self.destinations and dest in self.destinations:
             return True
-        filter = set(['invalid', 'obstacle'])
-        if len(filter & set(rg.loc_types(dest))) != 0:
+        if not maptables.tables().is_walkable(dest):
             return True
         return False
 
-    def locs_around(self, location, radius=1, top_level=True):
-        around = rg.locs_around(location,
-                                filter_out=('invalid', 'obstacle'))
-        # base case
-        if radius == 1:
-            if not top_level:
-                around.append(location)
-            return around
-
-        # recursively accumulate
-        results = []
-        for l in around:
-            results.extend(self.locs_around(l, radius=radius-1, top_level=False))
-
-        # don't return the original location
-        if top_level and location in results:
-            results.remove(location)
-        return results
+    def locs_around(self, location, radius=1):
+        """Walkable locations within radius steps, without duplicates"""
+        return maptables.tables().within(location, radius)
 
     def find_escape(self, from_loc, filter_func=None):
-        for s in self.locs_around(from_loc):
-            if not self.is_blocked(s):
-                if (not filter_func or filter_func(s)) and \
-                  (not self.incoming_spawns() or not self.is_spawn_point(s)):
-                    return s
-        return None
+        escapes = self.find_escapes(from_loc, filter_func)
+        return escapes[0] if escapes else None
+
+    def find_escapes(self, from_loc, filter_func=None):
+        """Open cells next to from_loc that pass filter_func and won't
+        have a robot spawn on them"""
+        return [s for s in self.locs_around(from_loc)
+                if not self.is_blocked(s) and
+                (not filter_func or filter_func(s)) and
+                (not self.incoming_spawns() or not self.is_spawn_point(s))]
 
     def is_spawn_point(self, loc):
-        return 'spawn' in rg.loc_types(loc)
+        return maptables.tables().is_spawn(loc)
+
+
+# RobotBrain constants tools.tuner may change, and the ranges it tries
+PARAMS = {
+    'AVG_DAMAGE': (6, 12),
+    'SUPPORT_FRIENDS': (1, 4),
+    'TARGET_DIST_WEIGHT': (1, 10),
+    'KILL_VALUE': (0, 50),
+    'EMPTY_ATTACK_CHANCE': (0.1, 0.6),
+    'STAY_COST': (1, 8),
+    'PANIC_COST': (3, 20),
+}
+
+
+def defaults():
+    """The current values of PARAMS"""
+    return dict((name, getattr(RobotBrain, name)) for name in PARAMS)
+
+
+def tuned(**params):
+    """A Robot class whose brain uses params instead of the defaults"""
+    unknown = set(params) - set(PARAMS)
+    if unknown:
+        raise ValueError("goose can't tune {p}".format(
+            p=', '.join(sorted(unknown))))
+    brain = type('TunedBrain', (RobotBrain,), params)
+
+    class Tuned(Robot):
+        # plans made with other constants mustn't be picked up
+        plans = PlanCache()
+
+        def make_brain(self, game):
+            return brain(game)
+    return Tuned
+
+
+counters.instrument(RobotBrain, 'nearby_robots', 'under_attack',
+                    'last_stand', 'assign_moves')
+counters.instrument(Navigator, 'step_toward', 'steps_toward', 'find_escape',
+                    'find_escapes')
@@ -0,0 +1,179 @@
+import settings as rgs
+
+import records
+
+
+class TurnCache(object):
+    """Holds values for the current turn of the current game
+
+    Keyed on the game's robots dict itself rather than its id(), so a
+    later game can never pick up a value built for an earlier one. Extra
+    key parts (e.g. a player_id) get a value each until the turn ends.
+    """
+
+    def __init__(self):
+        self.robots = None
+        self.turn = None
+        self.values = {}
+
+    def get(self, game, build, *extra):
+        """The cached value, or build() on the first ask this turn"""
+        self.start(game)
+        if extra not in self.values:
+            self.values[extra] = build()
+        return self.values[extra]
+
+    def put(self, game, value, *extra):
+        """Makes value this turn's, as if build() had returned it"""
+        self.start(game)
+        self.values[extra] = value
+
+    def start(self, game):
+        if self.robots is not game['robots'] or self.turn != game['turn']:
+            self.robots = game['robots']
+            self.turn = game['turn']
+            self.values = {}
+
+
+class OccupancyGrid(object):
+    """Who is standing where on the board, built once per turn
+
+    Cells live in flat lists indexed by x * size + y, so neighbor and
+    radius queries are a handful of list lookups instead of a scan over
+    every robot in the game. The robots themselves are RobotRecords.
+    """
+    # Same order as rg.locs_around
+    NEIGHBORS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+    _turn = TurnCache()
+    _offsets = {}
+    _cells = {}
+
+    def __init__(self, robots, size=None):
+        self.size = size or rgs.settings.board_size
+        cells = self.size * self.size
+        self.owner = [None] * cells
+        self.hp = [0] * cells
+        self.bots = [None] * cells
+        self.by_owner = {}
+        self._others = {}
+
+        # in location order, so team lists don't depend on dict order
+        for bot in records.adapt(robots, self.size):
+            self.owner[bot.cell] = bot.player_id
+            self.hp[bot.cell] = bot.hp
+            self.bots[bot.cell] = bot
+            self.by_owner.setdefault(bot.player_id, []).append(bot)
+
+    @classmethod
+    def for_game(cls, game):
+        """The grid for this turn, shared by every caller on the turn"""
+        return cls._turn.get(game, lambda: cls(game['robots']))
+
+    def apply(self, robots, changes):
+        """Brings the grid up to date with robots, given the cells that
+        changed since it was built: {loc: (before, after)}, each
+        (hp, player_id, robot_id) or None for an empty cell. Records for
+        the cells that didn't change are kept."""
+        for loc, (_, after) in changes.items():
+            i = self.index(loc)
+            if after is None:
+                self.owner[i] = None
+                self.hp[i] = 0
+                self.bots[i] = None
+            else:
+                bot = records.record(loc, robots[loc], self.size)
+                self.owner[i] = bot.player_id
+                self.hp[i] = bot.hp
+                self.bots[i] = bot
+        # cell order is location order
+        self.by_owner = {}
+        self._others = {}
+        for bot in self.bots:
+            if bot is not None:
+                self.by_owner.setdefault(bot.player_id, []).append(bot)
+
+    def index(self, loc):
+        """Flat cell index for loc, or None when off the board"""
+        x, y = loc
+        if 0 <= x < self.size and 0 <= y < self.size:
+            return x * self.size + y
+        return None
+
+    def robot_at(self, loc):
+        i = self.index(loc)
+        if i is None:
+            return None
+        return self.bots[i]
+
+    def owner_at(self, loc):
+        i = self.index(loc)
+        if i is None:
+            return None
+        return self.owner[i]
+
+    def around(self, center, player_id=None, allies=True, radius=1):
+        """Robots within radius steps of center (but not on it)
+
+        With a player_id, only that player's robots are returned when
+        allies is True, and only their opponents' robots otherwise.
+        """
+        return self.collect(self.cells_around(center, radius), player_id,
+                            allies)
+
+    def on_ring(self, center, radius, player_id=None, allies=True):
+        """Like around(), but only robots exactly radius steps away"""
+        return self.collect(self.cells_around(center, radius, True),
+                            player_id, allies)
+
+    def collect(self, cells, player_id, allies):
+        found = []
+        bots = self.bots
+        for i in cells:
+            bot = bots[i]
+            if bot is None:
+                continue
+            if player_id is None or (bot.player_id == player_id) == allies:
+                found.append(bot)
+        return found
+
+    def cells_around(self, center, radius, ring=False):
+        """Flat indexes of the on-board cells 1..radius steps (or exactly
+        radius steps, for a ring) from center, nearest first. Worked out
+        once per center and kept."""
+        key = (self.size, center, radius, ring)
+        if key not in self._cells:
+            offsets = self.offsets(radius)
+            if ring:
+                offsets = offsets[2 * (radius - 1) * radius:]
+            cells = (self.index((center[0] + dx, center[1] + dy))
+                     for dx, dy in offsets)
+            self._cells[key] = tuple(i for i in cells if i is not None)
+        return self._cells[key]
+
+    def count_around(self, center, player_id=None, allies=True, radius=1):
+        return len(self.around(center, player_id, allies, radius))
+
+    def team(self, player_id, allies=True):
+        """All of a player's robots, or all of their opponents'"""
+        if allies:
+            return self.by_owner.get(player_id, [])
+        if player_id not in self._others:
+            self._others[player_id] = [bot for owner, bots in
+                                       self.by_owner.items()
+                                       if owner != player_id
+                                       for bot in bots]
+        return self._others[player_id]
+
+    @classmethod
+    def offsets(cls, radius):
+        """(dx, dy) for every cell 1..radius steps away, nearest first"""
+        if radius not in cls._offsets:
+            found = list(cls.NEIGHBORS)
+            for r in range(2, radius + 1):
+                found.extend((dx, dy)
+                             for dx in range(-r, r + 1)
+                             for dy in range(-r, r + 1)
+                             if abs(dx) + abs(dy) == r)
+            cls._offsets[radius] = tuple(found)
+        return cls._offsets[radius]
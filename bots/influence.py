@@ -0,0 +1,157 @@
+"""Whole-board threat and support counts for one player's turn
+
+Instead of counting the robots around a cell every time a tactic asks,
+every count is worked out for every cell at once from the occupancy grid
+and the tactics just look theirs up. Uses numpy when it's around and
+falls back to plain loops over the robots when it isn't.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import settings as rgs
+
+from grid import OccupancyGrid, TurnCache
+
+
+class InfluenceMap(object):
+    """Per-cell counts from one player's point of view, indexed [x][y]
+
+    enemy_adj / friend_adj: enemies / friends next to the cell
+    damage: expected attack damage taken standing there next turn
+    max_damage: the worst case of the same
+    suicidal: an enemy on the cell we expect to blow itself up
+    suicide_risk: number of those suicidal enemies next to the cell
+    """
+    _turn = TurnCache()
+
+    def __init__(self, grid, player_id, avg_damage=None):
+        low, high = rgs.settings.attack_range
+        self.avg_damage = avg_damage or (low + high) / 2.0
+        self.max_hit = high
+        self.player_id = player_id
+        if np is not None:
+            self.build_arrays(grid, player_id)
+        else:
+            self.build_lists(grid, player_id)
+
+    @classmethod
+    def for_game(cls, game, player_id, avg_damage=None):
+        """The map for this turn, shared by every caller on the turn"""
+        build = lambda: cls(OccupancyGrid.for_game(game), player_id,
+                            avg_damage)
+        return cls._turn.get(game, build, player_id, avg_damage)
+
+    def build_arrays(self, grid, player_id):
+        size = grid.size
+        owner = np.array([-1 if o is None else o for o in grid.owner])
+        owner = owner.reshape(size, size)
+        hp = np.array(grid.hp).reshape(size, size)
+
+        enemy = (owner != -1) & (owner != player_id)
+        friend = owner == player_id
+        enemy_adj = cross_sum(enemy.astype(int))
+        friend_adj = cross_sum(friend.astype(int))
+        suicidal = enemy & (hp <= friend_adj * self.avg_damage)
+
+        self.arrays = {
+            'enemy_adj': enemy_adj,
+            'friend_adj': friend_adj,
+            'damage': enemy_adj * self.avg_damage,
+            'max_damage': enemy_adj * self.max_hit,
+            'suicidal': suicidal,
+            'suicide_risk': cross_sum(suicidal.astype(int)),
+        }
+        # plain lists are quicker than numpy for one cell at a time
+        for name, array in self.arrays.items():
+            setattr(self, name, array.tolist())
+
+    def build_lists(self, grid, player_id):
+        size = grid.size
+        self.arrays = None
+        self.enemy_adj = [[0] * size for _ in range(size)]
+        self.friend_adj = [[0] * size for _ in range(size)]
+        self.suicidal = [[False] * size for _ in range(size)]
+        self.suicide_risk = [[0] * size for _ in range(size)]
+
+        for owner, bots in grid.by_owner.items():
+            counts = self.friend_adj if owner == player_id \
+              else self.enemy_adj
+            for bot in bots:
+                for x, y in self.adjacent(bot.location, size):
+                    counts[x][y] += 1
+
+        for bot in grid.team(player_id, allies=False):
+            x, y = bot.location
+            if bot.hp <= self.friend_adj[x][y] * self.avg_damage:
+                self.suicidal[x][y] = True
+                for ax, ay in self.adjacent(bot.location, size):
+                    self.suicide_risk[ax][ay] += 1
+
+        self.damage = [[n * self.avg_damage for n in row]
+                       for row in self.enemy_adj]
+        self.max_damage = [[n * self.max_hit for n in row]
+                           for row in self.enemy_adj]
+
+    def apply(self, grid, changes):
+        """Updates the counts around the cells in changes, the same
+        {loc: (before, after)} the grid was just brought up to date with,
+        instead of recounting the whole board"""
+        self.arrays = None
+        touched = set()
+        for loc, states in changes.items():
+            for state, step in zip(states, (-1, 1)):
+                if state is None:
+                    continue
+                counts = self.friend_adj if state[1] == self.player_id \
+                  else self.enemy_adj
+                for x, y in self.adjacent(loc, grid.size):
+                    counts[x][y] += step
+                    touched.add((x, y))
+
+        for x, y in touched:
+            self.damage[x][y] = self.enemy_adj[x][y] * self.avg_damage
+            self.max_damage[x][y] = self.enemy_adj[x][y] * self.max_hit
+
+        # enemies whose hp or support changed may have turned suicidal
+        for loc in touched.union(changes):
+            x, y = loc
+            i = grid.index(loc)
+            owner = grid.owner[i]
+            suicidal = owner is not None and owner != self.player_id and \
+              grid.hp[i] <= self.friend_adj[x][y] * self.avg_damage
+            if suicidal != bool(self.suicidal[x][y]):
+                self.suicidal[x][y] = suicidal
+                step = 1 if suicidal else -1
+                for ax, ay in self.adjacent(loc, grid.size):
+                    self.suicide_risk[ax][ay] += step
+
+    @staticmethod
+    def adjacent(loc, size):
+        x, y = loc
+        for ax, ay in ((x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y)):
+            if 0 <= ax < size and 0 <= ay < size:
+                yield ax, ay
+
+    def enemies_near(self, loc):
+        return self.enemy_adj[loc[0]][loc[1]]
+
+    def friends_near(self, loc):
+        return self.friend_adj[loc[0]][loc[1]]
+
+    def expected_damage(self, loc):
+        return self.damage[loc[0]][loc[1]]
+
+    def is_suicidal(self, loc):
+        return bool(self.suicidal[loc[0]][loc[1]])
+
+    def suicide_threat(self, loc):
+        return self.suicide_risk[loc[0]][loc[1]]
+
+
+def cross_sum(a):
+    """Sum of the four orthogonal neighbors of every cell"""
+    padded = np.pad(a, 1, 'constant')
+    return (padded[:-2, 1:-1] + padded[2:, 1:-1] +
+            padded[1:-1, :-2] + padded[1:-1, 2:])
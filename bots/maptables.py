@@ -0,0 +1,127 @@
+"""Lookup tables for the static parts of the map
+
+The map never changes during a match, so walkability, spawn points,
+each cell's walkable neighbors and the cells within a few steps of it
+are worked out once per process from rg.loc_types and then only read.
+The tables are built the first time they're asked for rather than at
+import, since the game loads the map settings after the robot code may
+already have been imported.
+"""
+import rg
+import settings as rgs
+
+
+class MapTables(object):
+    """Immutable per-cell tables, indexed by x * size + y
+
+    Everything is stored in tuples, so one instance can be pickled and
+    handed to worker processes instead of being rebuilt in each of them.
+
+    rings[i][k] holds the cells exactly k walking steps from cell i, and
+    disks[i][k] the cells 1..k steps away, for k up to max_radius.
+    """
+    MAX_RADIUS = 4
+
+    def __init__(self, size=None, max_radius=MAX_RADIUS):
+        self.size = size or rgs.settings.board_size
+        self.max_radius = max_radius
+        walkable = []
+        spawn = []
+        neighbors = []
+        for x in range(self.size):
+            for y in range(self.size):
+                types = rg.loc_types((x, y))
+                walkable.append(not ('invalid' in types or
+                                     'obstacle' in types))
+                spawn.append('spawn' in types)
+                neighbors.append(tuple(rg.locs_around(
+                    (x, y), filter_out=('invalid', 'obstacle'))))
+        self.walkable = tuple(walkable)
+        self.spawn = tuple(spawn)
+        self.neighbors = tuple(neighbors)
+
+        rings = []
+        disks = []
+        for x in range(self.size):
+            for y in range(self.size):
+                by_dist = self._walk((x, y), self.max_radius)
+                rings.append(by_dist)
+                disk = [()]
+                for ring in by_dist[1:]:
+                    disk.append(disk[-1] + ring)
+                disks.append(tuple(disk))
+        self.rings = tuple(rings)
+        self.disks = tuple(disks)
+
+    def _walk(self, start, radius):
+        """Breadth first walk out from start, one tuple of cells per step"""
+        seen = set([start])
+        by_dist = [(start,)]
+        for _ in range(radius):
+            ring = []
+            for loc in by_dist[-1]:
+                for n in self.neighbors_of(loc):
+                    if n not in seen:
+                        seen.add(n)
+                        ring.append(n)
+            by_dist.append(tuple(ring))
+        return tuple(by_dist)
+
+    def index(self, loc):
+        """Flat cell index for loc, or None when off the board"""
+        x, y = loc
+        if 0 <= x < self.size and 0 <= y < self.size:
+            return x * self.size + y
+        return None
+
+    def is_walkable(self, loc):
+        i = self.index(loc)
+        return i is not None and self.walkable[i]
+
+    def is_spawn(self, loc):
+        i = self.index(loc)
+        return i is not None and self.spawn[i]
+
+    def neighbors_of(self, loc):
+        """Walkable cells next to loc, in rg.locs_around order"""
+        i = self.index(loc)
+        if i is None:
+            return tuple(rg.locs_around(loc, filter_out=('invalid',
+                                                         'obstacle')))
+        return self.neighbors[i]
+
+    def ring(self, loc, radius):
+        """Walkable cells exactly radius steps from loc"""
+        i = self.index(loc)
+        if i is None or radius > self.max_radius:
+            return self._walk(loc, radius)[radius]
+        return self.rings[i][radius]
+
+    def within(self, loc, radius):
+        """Walkable cells 1..radius steps from loc, nearest first"""
+        i = self.index(loc)
+        if i is None or radius > self.max_radius:
+            return sum(self._walk(loc, radius)[1:], ())
+        return self.disks[i][radius]
+
+
+_tables = None
+
+
+def tables():
+    """The map tables for this process, built on first use"""
+    global _tables
+    if _tables is None:
+        _tables = MapTables()
+    return _tables
+
+
+def install(prebuilt):
+    """Use tables built elsewhere, e.g. passed in from a parent process"""
+    global _tables
+    _tables = prebuilt
+
+
+def reset():
+    """Forget the tables, for when the next match is on another map"""
+    install(None)
@@ -0,0 +1,143 @@
+"""Breadth first distance fields for picking the next step toward a target
+
+A distance field holds the walking distance from every cell on the board
+to the nearest of a set of targets, so "which way to the center / that
+enemy / those escape cells" becomes a lookup on the cells next to us.
+Fields over the bare map never change and are kept across turns, fields
+that also route around robots are built at most once per turn.
+"""
+import collections
+
+import maptables
+from grid import TurnCache
+
+UNREACHABLE = 9999
+
+
+class DistanceField(object):
+    """Multi-source BFS distances to the nearest of targets
+
+    Cells in blocked (flat indexes) can't be walked through, unless they
+    are one of the targets.
+    """
+
+    def __init__(self, targets, blocked=(), tables=None):
+        self.tables = tables or maptables.tables()
+        size = self.tables.size
+        self.dist = dist = [UNREACHABLE] * (size * size)
+
+        frontier = []
+        for loc in targets:
+            i = self.tables.index(loc)
+            if i is not None and dist[i] == UNREACHABLE:
+                dist[i] = 0
+                frontier.append(loc)
+
+        step = 0
+        while frontier:
+            step += 1
+            next_frontier = []
+            for loc in frontier:
+                for n in self.tables.neighbors_of(loc):
+                    i = n[0] * size + n[1]
+                    if dist[i] == UNREACHABLE and i not in blocked:
+                        dist[i] = step
+                        next_frontier.append(n)
+            frontier = next_frontier
+
+    def distance(self, loc):
+        i = self.tables.index(loc)
+        if i is None:
+            return UNREACHABLE
+        return self.dist[i]
+
+
+class Pathfinder(object):
+    """Next step lookups for one turn of one game
+
+    next_step first tries to make progress on the map-only field for the
+    targets. If every cell that gets closer is blocked (usually by other
+    robots), it falls back to a field that routes around this turn's
+    robots, so we walk around a wall of bots instead of stalling.
+    """
+    MAX_STATIC_FIELDS = 256
+
+    _static = collections.OrderedDict()
+    _turn = TurnCache()
+
+    def __init__(self, robots, tables=None):
+        self.tables = tables or maptables.tables()
+        self.blocked = frozenset(self.tables.index(loc) for loc in robots)
+        self.fields = {}
+
+    @classmethod
+    def for_game(cls, game):
+        """The pathfinder for this turn, shared by every caller on the turn"""
+        return cls._turn.get(game, lambda: cls(game['robots']))
+
+    def static_field(self, targets):
+        """Map-only field for targets, shared across turns (and games on
+        the same map)"""
+        key = (self.tables, targets)
+        if key in self._static:
+            field = self._static.pop(key)
+        else:
+            field = DistanceField(targets, tables=self.tables)
+        self._static[key] = field
+        while len(self._static) > self.MAX_STATIC_FIELDS:
+            self._static.popitem(last=False)
+        return field
+
+    def dynamic_field(self, targets):
+        """Field that treats this turn's robots (except targets) as walls"""
+        if targets not in self.fields:
+            self.fields[targets] = DistanceField(targets, self.blocked,
+                                                 self.tables)
+        return self.fields[targets]
+
+    def next_step(self, loc, targets, is_blocked):
+        """Best neighbor of loc to move to on the way to the nearest of
+        targets. is_blocked(loc) says whether we may step onto a cell
+        right now. Returns None when there's nowhere useful to go.
+        """
+        steps = self.next_steps(loc, targets, is_blocked)
+        return steps[0] if steps else None
+
+    def next_steps(self, loc, targets, is_blocked):
+        """Every useful neighbor of loc on the way to targets, best first"""
+        targets = frozenset(targets)
+        if not targets:
+            return []
+        aim = iter(targets).next() if len(targets) == 1 else None
+
+        static = self.static_field(targets)
+        here = static.distance(loc)
+        if here == 0 or here == UNREACHABLE:
+            return []
+
+        open_cells = [n for n in self.tables.neighbors_of(loc)
+                      if not is_blocked(n)]
+        closer = [n for n in open_cells if static.distance(n) < here]
+        if closer:
+            return sorted(closer, key=lambda n: self.preference(loc, n, aim))
+        if here == 1:
+            # the target itself is taken, walking around it won't help
+            return []
+
+        dynamic = self.dynamic_field(targets)
+        reachable = [n for n in open_cells
+                     if dynamic.distance(n) != UNREACHABLE]
+        return sorted(reachable,
+                      key=lambda n: (dynamic.distance(n),
+                                     self.preference(loc, n, aim)))
+
+    def preference(self, loc, step, aim):
+        """Tie break between equally good steps: like the old ant
+        navigation, close the bigger of the x / y gaps first"""
+        if aim is None:
+            return 0
+        dx, dy = abs(aim[0] - loc[0]), abs(aim[1] - loc[1])
+        moves_x = step[0] != loc[0]
+        if dx > dy:
+            return 0 if moves_x else 1
+        return 1 if moves_x else 0
@@ -0,0 +1,119 @@
+"""Where the enemy robots are likely to step next turn
+
+Rather than each of our robots looking through every enemy for one it
+might cut off, the odds of every enemy's next move are worked out once
+per turn and summed per cell, so "is an enemy likely to walk in here"
+is a lookup. Each enemy's moves are weighed by:
+
+- approach: steps that get closer to our nearest robot
+- momentum: carrying on the way it moved last turn
+- engagement: an enemy already next to one of ours mostly stays to fight
+- spawn timing: nobody wants to be on a spawn point when robots spawn
+"""
+import settings as rgs
+
+import maptables
+from grid import OccupancyGrid, TurnCache
+from pathing import DistanceField
+
+
+class Forecast(object):
+    """One player's guess at the enemies' next moves, built once per turn
+
+    arrival: per flat cell index, the expected number of enemies
+    stepping onto the (now empty) cell next turn.
+    staying: per flat cell index, the chance the enemy there stays put.
+    """
+    STAY_WEIGHT = 2
+    ENGAGED_STAY_WEIGHT = 6
+    WANDER_WEIGHT = 1
+    APPROACH_WEIGHT = 3
+    MOMENTUM_WEIGHT = 2
+
+    _turn = TurnCache()
+
+    def __init__(self, game, player_id, model=None):
+        self.tables = tables = maptables.tables()
+        grid = OccupancyGrid.for_game(game)
+        size = tables.size
+        self.arrival = [0.0] * (size * size)
+        self.staying = [0.0] * (size * size)
+
+        enemies = grid.team(player_id, allies=False)
+        friends = grid.team(player_id)
+        if not enemies or not friends:
+            return
+        to_us = DistanceField([bot.location for bot in friends],
+                              tables=tables).dist
+
+        # the same test as GameWatcher.incoming_spawns, for next turn
+        spawning = (game['turn'] + 1) % rgs.settings.spawn_every == 1
+        # where each robot that moved last turn came from, by where it is
+        # now: the game hides enemy ids, and the model matched them up
+        came_from = {}
+        if model is not None and model.history and \
+          model.history[-1].turn == game['turn']:
+            came_from = dict((after, before) for before, after in
+                             model.history[-1].moved.values())
+
+        for bot in enemies:
+            loc = bot.location
+            here = to_us[bot.cell]
+            stay = self.ENGAGED_STAY_WEIGHT if here == 1 \
+              else self.STAY_WEIGHT
+            heading = None
+            if loc in came_from:
+                before = came_from[loc]
+                heading = (loc[0] - before[0], loc[1] - before[1])
+
+            steps = []
+            for n in tables.neighbors_of(loc):
+                i = n[0] * size + n[1]
+                if grid.bots[i] is not None:
+                    continue
+                if spawning and tables.spawn[i]:
+                    continue
+                weight = self.WANDER_WEIGHT
+                if to_us[i] < here:
+                    weight += self.APPROACH_WEIGHT
+                if heading == (n[0] - loc[0], n[1] - loc[1]):
+                    weight += self.MOMENTUM_WEIGHT
+                steps.append((i, weight))
+            if spawning and tables.spawn[bot.cell] and steps:
+                stay = 0
+
+            total = float(stay + sum(w for _, w in steps))
+            self.staying[bot.cell] = stay / total
+            for i, weight in steps:
+                self.arrival[i] += weight / total
+
+    @classmethod
+    def for_game(cls, game, player_id, model=None):
+        """The forecast for this turn, shared by every caller on the turn.
+        model is the player's WorldModel, for last turn's moves."""
+        return cls._turn.get(game, lambda: cls(game, player_id, model),
+                             player_id)
+
+    def arrival_chance(self, loc):
+        i = self.tables.index(loc)
+        if i is None:
+            return 0.0
+        return self.arrival[i]
+
+    def stay_chance(self, loc):
+        i = self.tables.index(loc)
+        if i is None:
+            return 0.0
+        return self.staying[i]
+
+    def best_attack(self, loc, min_chance, allowed=None):
+        """The cell next to loc an enemy is most likely to step into, if
+        that's at least min_chance and allowed(cell) says we may hit it.
+        None otherwise."""
+        best, best_chance = None, min_chance
+        for n in self.tables.neighbors_of(loc):
+            chance = self.arrival[n[0] * self.tables.size + n[1]]
+            better = chance > best_chance if best else chance >= min_chance
+            if better and (allowed is None or allowed(n)):
+                best, best_chance = n, chance
+        return best
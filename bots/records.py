@@ -0,0 +1,36 @@
+"""Compact robot records for the bots' own bookkeeping
+
+The game hands act() a fresh dict-backed object for every robot on every
+turn. The bots copy what they need out of those once, into slotted
+records that are a fraction of the size, carry the location packed into
+a flat cell index as well as the (x, y) tuple, and can be kept from one
+turn to the next for every robot that didn't change.
+"""
+
+
+class RobotRecord(object):
+    """One robot: location (x, y), cell (x * size + y), hp, player_id and
+    robot_id (None when the game doesn't say)"""
+    __slots__ = ('location', 'cell', 'hp', 'player_id', 'robot_id')
+
+    def __init__(self, location, cell, hp, player_id, robot_id=None):
+        self.location = location
+        self.cell = cell
+        self.hp = hp
+        self.player_id = player_id
+        self.robot_id = robot_id
+
+    def __repr__(self):
+        return 'RobotRecord({l}, hp={h}, player_id={p})'.format(
+            l=self.location, h=self.hp, p=self.player_id)
+
+
+def record(loc, bot, size):
+    """The record for one of game['robots']"""
+    return RobotRecord(loc, loc[0] * size + loc[1], bot.hp, bot.player_id,
+                       bot.get('robot_id'))
+
+
+def adapt(robots, size):
+    """Records for game['robots'], in location order"""
+    return [record(loc, bot, size) for loc, bot in sorted(robots.items())]
@@ -0,0 +1,233 @@
+"""Array-backed simulation of the next turn, for scoring candidate moves
+
+A State holds the board as parallel numpy arrays (cell, hp, owner, one
+entry per robot), and simulate() plays K joint actions for all of those
+robots at once, so comparing a robot's options is a handful of array
+operations rather than K trips through the game. The rules follow
+rgkit's:
+
+- moves into the same cell, into a robot that stays, or through each
+  other (swaps and longer rings) fail, and the robot stays put
+- every robot contending for a cell where a move failed takes collision
+  damage for each enemy contending for it, unless it's guarding
+- attacks hit whatever enemy ends the turn on the target cell, suicides
+  hit every enemy around the robot, both for half when guarding
+- suicides die, and so does anyone left at 0 hp
+
+Attacks do a fixed attack_damage (the middle of the attack range unless
+given) instead of a random roll, so outcomes are expected values. New
+spawns aren't simulated, and actions are assumed to be legal.
+
+simulate() doesn't need every row to start from the same board: a state
+whose loc, hp and owner are (K, N) arrays holds K separate boards, which
+is how tools.batchsim plays many games at once.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import settings as rgs
+
+import maptables
+from grid import TurnCache
+
+ACTIONS = ('guard', 'move', 'attack', 'suicide')
+GUARD, MOVE, ATTACK, SUICIDE = range(len(ACTIONS))
+
+
+class State(object):
+    """Robot i stands on flat cell loc[i] with hp[i] and belongs to player
+    owner[i]. Robots are kept in location order."""
+    _turn = TurnCache()
+
+    def __init__(self, robots, tables=None):
+        """robots: (loc, hp, player_id) tuples"""
+        self.tables = tables or maptables.tables()
+        robots = sorted(robots)
+        self.locs = [r[0] for r in robots]
+        self.index = dict((loc, i) for i, loc in enumerate(self.locs))
+        self.loc = np.array([self.tables.index(l) for l in self.locs],
+                            dtype=np.intp)
+        self.hp = np.array([r[1] for r in robots], dtype=np.int32)
+        self.owner = np.array([r[2] for r in robots], dtype=np.intp)
+
+    @classmethod
+    def from_game(cls, game):
+        return cls([(loc, bot.hp, bot.player_id)
+                    for loc, bot in game['robots'].items()])
+
+    @classmethod
+    def for_game(cls, game):
+        """The state for this turn, shared by every caller on the turn"""
+        return cls._turn.get(game, lambda: cls.from_game(game))
+
+    def __len__(self):
+        return len(self.locs)
+
+    def blank(self, count):
+        """(kind, target) for count joint actions where everyone guards,
+        ready to have some robots' actions filled in"""
+        kind = np.zeros((count, len(self)), dtype=np.int8)
+        target = np.empty((count, len(self)), dtype=np.intp)
+        target[:] = self.loc
+        return kind, target
+
+    def set(self, kind, target, k, loc, action):
+        """Puts an act()-style action for the robot on loc in row k"""
+        i = self.index[loc]
+        kind[k, i] = ACTIONS.index(action[0])
+        if len(action) > 1:
+            target[k, i] = self.tables.index(tuple(action[1]))
+
+    def encode(self, joint_actions):
+        """(kind, target) arrays of shape (K, N) from K {loc: action}
+        dicts. Robots without an action guard."""
+        kind, target = self.blank(len(joint_actions))
+        for k, actions in enumerate(joint_actions):
+            for loc, action in actions.items():
+                self.set(kind, target, k, loc, action)
+        return kind, target
+
+
+class Outcome(object):
+    """Where everyone ended up, (K, N) arrays like the actions"""
+
+    def __init__(self, state, loc, hp):
+        self.state = state
+        self.loc = loc
+        self.hp = hp
+        self.alive = hp > 0
+
+    def balance(self, player_id, kill_value=0):
+        """(K,) hp we have left minus hp they have left, plus kill_value for
+        every enemy that died and minus it for every robot we lost"""
+        ours = self.state.owner == player_id
+        sign = np.where(ours, 1, -1)
+        return ((self.hp * sign).sum(axis=1) -
+                kill_value * (~self.alive * sign).sum(axis=1))
+
+
+def simulate(state, kind, target, attack_damage=None):
+    """Plays K joint actions from state, returns their Outcome
+
+    attack_damage may also be a (K, N) array, each robot's own roll.
+    """
+    tables = state.tables
+    cells = tables.size * tables.size
+    count, n = kind.shape
+    if attack_damage is None:
+        low, high = rgs.settings.attack_range
+        attack_damage = (low + high) // 2
+    rows = np.arange(count)[:, None]
+    start = np.broadcast_to(state.loc, (count, n))
+
+    moves = kind == MOVE
+    wanted = np.where(moves, target, start)
+    occupant = np.full((count, cells + 1), -1, dtype=np.intp)
+    occupant[rows, start] = np.arange(n)
+    blocker = occupant[rows, wanted]
+
+    dest = wanted.copy()
+    moving = moves.copy()
+    while moving.any():
+        flat = rows * (cells + 1) + dest
+        crowded = np.bincount(flat.ravel())[flat] > 1
+        # into an empty cell, or behind a robot that gets away itself
+        ok = moving & ~crowded & (blocker < 0)
+        behind = moving & ~crowded & (blocker >= 0)
+        while True:
+            gets_away = behind & ok[rows, np.maximum(blocker, 0)]
+            if not (gets_away & ~ok).any():
+                break
+            ok |= gets_away
+        failed = moving & ~ok
+        if not failed.any():
+            break
+        dest = np.where(failed, start, dest)
+        moving &= ~failed
+
+    players = int(state.owner.max()) + 1 if n else 1
+    owner = np.broadcast_to(state.owner, (count, n))
+    guarding = kind == GUARD
+
+    # collisions: every robot that wanted or ended up on a cell where a
+    # move failed, against every enemy that did the same
+    shape = (count, cells + 1, players)
+    every = np.broadcast_to(rows, (count, n))
+    failed = moves & (dest != wanted)
+    collision = np.zeros((count, n))
+    if failed.any():
+        bumped = np.zeros((count, cells + 1), dtype=bool)
+        bumped[np.nonzero(failed)[0], wanted[failed]] = True
+        # a robot that moved where it wanted only contends for that cell
+        contests = [(wanted, moves), (dest, ~(moves & (dest == wanted)))]
+        by_player = sum(tally(shape, (every[who], at[who], owner[who]))
+                        for at, who in contests)
+        enemies_at = by_player.sum(axis=2)[..., None] - by_player
+        for at, who in contests:
+            hits = enemies_at[rows, at, owner] * (who & bumped[rows, at])
+            collision += hits
+        collision *= rgs.settings.collision_damage
+        collision[guarding] = 0
+
+    # attacks and suicides land on whoever ends the turn there
+    attacks = kind == ATTACK
+    where = (every[attacks], target[attacks], owner[attacks])
+    if np.ndim(attack_damage):
+        hurt = tally(shape, where, attack_damage[attacks])
+    else:
+        hurt = attack_damage * tally(shape, where)
+    suicides = kind == SUICIDE
+    if suicides.any():
+        blast = neighbor_table(tables)[start[suicides]]
+        sides = blast.shape[1]
+        hurt += rgs.settings.suicide_damage * tally(
+            shape, (np.repeat(every[suicides], sides), blast.ravel(),
+                    np.repeat(owner[suicides], sides)))
+    hurt_by_enemies = hurt.sum(axis=2)[..., None] - hurt
+    damage = hurt_by_enemies[rows, dest, owner]
+    damage = np.where(guarding, damage // 2, damage)
+
+    hp = state.hp - collision - damage
+    hp[suicides] = 0
+    return Outcome(state, dest, np.maximum(hp, 0).astype(np.int32))
+
+
+def score_options(state, loc, options, attackers, player_id,
+                  attack_damage=None, kill_value=0):
+    """(K,) Outcome.balance of the robot on loc taking each of options
+    while every robot on attackers hits it and everyone else guards"""
+    kind, target = state.blank(len(options))
+    for k, action in enumerate(options):
+        state.set(kind, target, k, loc, action)
+        for attacker in attackers:
+            state.set(kind, target, k, attacker, ['attack', loc])
+    outcome = simulate(state, kind, target, attack_damage)
+    return outcome.balance(player_id, kill_value)
+
+
+def tally(shape, index, weights=None):
+    """Array of shape counting how often each index tuple appears, or
+    adding up their weights"""
+    flat = np.ravel_multi_index(index, shape)
+    size = int(np.prod(shape))
+    return np.bincount(flat, weights, minlength=size).reshape(shape)
+
+
+_neighbors = {}
+
+
+def neighbor_table(tables):
+    """(cells, 4) flat indexes of each cell's walkable neighbors, padded
+    with the spare cell past the end of the board"""
+    if tables not in _neighbors:
+        cells = tables.size * tables.size
+        table = np.full((cells, 4), cells, dtype=np.intp)
+        for x in range(tables.size):
+            for y in range(tables.size):
+                around = [tables.index(n) for n in tables.neighbors_of((x, y))]
+                table[tables.index((x, y)), :len(around)] = around
+        _neighbors.clear()
+        _neighbors[tables] = table
+    return _neighbors[tables]
@@ -0,0 +1,67 @@
+"""Structured decision tracing for the bots
+
+Trace points look like
+
+    if tracing.enabled:
+        tracing.record(turn, loc, 'escape', move, hp=hp)
+
+so while tracing is off (the default) a decision costs one flag check
+and nothing gets formatted or printed. While it's on, events go into a
+fixed-size ring buffer that can be dumped after the match.
+"""
+import collections
+import json
+import pickle
+
+CAPACITY = 4096
+
+enabled = False
+_events = collections.deque(maxlen=CAPACITY)
+
+
+def enable(capacity=CAPACITY):
+    """Start recording, keeping only the last capacity events"""
+    global enabled, _events
+    if capacity != _events.maxlen:
+        _events = collections.deque(_events, maxlen=capacity)
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def record(turn, loc, branch, move=None, **inputs):
+    """One decision: the turn, the robot's location, which branch of the
+    bot's logic fired, the move it picked and whatever went into it"""
+    _events.append((turn, loc, branch, move, inputs))
+
+
+def events():
+    """Recorded events, oldest first, as
+    (turn, loc, branch, move, inputs) tuples"""
+    return list(_events)
+
+
+def clear():
+    _events.clear()
+
+
+def dump_jsonl(path):
+    """Write the buffer as one JSON object per line"""
+    with open(path, 'w') as f:
+        for turn, loc, branch, move, inputs in _events:
+            f.write(json.dumps({'turn': turn, 'loc': loc, 'branch': branch,
+                                'move': move, 'inputs': inputs}) + '\n')
+
+
+def dump_binary(path):
+    """Write the buffer as a pickled list of event tuples"""
+    with open(path, 'wb') as f:
+        pickle.dump(events(), f, pickle.HIGHEST_PROTOCOL)
+
+
+def load_binary(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
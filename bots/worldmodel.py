@@ -0,0 +1,227 @@
+"""One player's picture of the game, carried from turn to turn
+
+Most of the board looks the same from one turn to the next, so instead
+of recounting everything from game['robots'] the model works out what
+changed since the last turn it saw (who moved, got hurt, died or
+spawned) and patches its occupancy grid and influence map around just
+those cells. Path finding fields are kept while nobody moves. The
+patched maps are handed to OccupancyGrid.for_game, InfluenceMap.for_game
+and Pathfinder.for_game, so the tactics pick them up without knowing.
+
+It also remembers the last few turns' changes and where each enemy has
+been, for anything that wants to guess where they're going. The game
+only tells us our own robots' ids, so enemies are followed from turn to
+turn by location and given ids of our own.
+"""
+import collections
+
+import settings as rgs
+
+import maptables
+from grid import OccupancyGrid
+from influence import InfluenceMap
+from pathing import Pathfinder
+
+
+class Diff(object):
+    """What changed between two boards ({loc: (hp, player_id, robot_id)},
+    with WorldModel's ids for the enemies)
+
+    cells: {loc: (before, after)}, each (hp, player_id, robot_id) or None
+    moved: {robot_id: (from, to)}
+    damaged: {robot_id: hp lost}
+    died: {robot_id: last location}
+    spawned: {robot_id: location}
+    """
+
+    def __init__(self, turn, before, after):
+        self.turn = turn
+        self.cells = {}
+        for loc in set(before).union(after):
+            old, new = before.get(loc), after.get(loc)
+            if old != new:
+                self.cells[loc] = (old, new)
+
+        was = dict((r[2], (loc, r[0])) for loc, r in before.items()
+                   if r[2] is not None)
+        now = dict((r[2], (loc, r[0])) for loc, r in after.items()
+                   if r[2] is not None)
+        self.moved = {}
+        self.damaged = {}
+        self.died = {}
+        self.spawned = {}
+        for robot_id, (loc, hp) in now.items():
+            if robot_id not in was:
+                self.spawned[robot_id] = loc
+                continue
+            old_loc, old_hp = was[robot_id]
+            if old_loc != loc:
+                self.moved[robot_id] = (old_loc, loc)
+            if old_hp != hp:
+                self.damaged[robot_id] = old_hp - hp
+        for robot_id, (loc, _) in was.items():
+            if robot_id not in now:
+                self.died[robot_id] = loc
+
+    def occupancy_changed(self):
+        """Did any robot arrive on or leave a cell"""
+        return any(old is None or new is None or old[1] != new[1]
+                   for old, new in self.cells.values())
+
+
+class WorldModel(object):
+    """Everything one player keeps between turns
+
+    grid, influence and paths are always up to date for the last turn
+    given to update(). history holds that many recent Diffs, tracks the
+    last few locations of every enemy robot, newest last, by robot id.
+    Enemy ids are negative and only mean something to this model.
+    """
+    HISTORY = 10
+    # Past this share of the robots on the board changing, patching the
+    # maps is no cheaper than building them again
+    REBUILD_SHARE = 0.5
+
+    _models = {}
+
+    def __init__(self, player_id, avg_damage=None):
+        self.player_id = player_id
+        self.avg_damage = avg_damage
+        self.turn = None
+        self.robots = None
+        self.board = {}
+        self.grid = None
+        self.influence = None
+        self.paths = None
+        self.history = collections.deque(maxlen=self.HISTORY)
+        self.tracks = {}
+        self.last_id = 0
+
+    @classmethod
+    def for_game(cls, game, player_id, avg_damage=None):
+        """The player's model, brought up to date with game"""
+        key = (player_id, avg_damage)
+        if key not in cls._models:
+            cls._models[key] = cls(player_id, avg_damage)
+        model = cls._models[key]
+        model.update(game)
+        return model
+
+    def update(self, game):
+        robots = game['robots']
+        turn = game['turn']
+        if robots is self.robots and turn == self.turn:
+            return
+        ids = self.identify(robots, turn)
+        board = dict((loc, (bot.hp, bot.player_id, ids[loc]))
+                     for loc, bot in robots.items())
+
+        if turn == self.turn and board == self.board:
+            # the same turn again, handed over in a new dict
+            pass
+        elif self.turn is not None and turn == self.turn + 1:
+            diff = Diff(turn, self.board, board)
+            self.patch(robots, diff)
+            self.remember(diff, board)
+        else:
+            # a different game, or turns we didn't see
+            self.rebuild(robots)
+            self.history.clear()
+            self.tracks = {}
+            self.remember(Diff(turn, {}, board), board)
+
+        self.robots = robots
+        self.turn = turn
+        self.board = board
+        self.install(game)
+
+    def identify(self, robots, turn):
+        """{loc: robot id} for robots. Robots without an id take the id
+        of the robot of the same player that was last turn on the same
+        cell, or else on a cell next to it, as long as they have no more
+        hp than it did. Anyone else is new, and so is everyone on a spawn
+        point on a spawn turn."""
+        ids = {}
+        unknown = []
+        for loc, bot in sorted(robots.items()):
+            robot_id = bot.get('robot_id')
+            if robot_id is None:
+                unknown.append(loc)
+            else:
+                ids[loc] = robot_id
+        if not unknown:
+            return ids
+
+        previous = {}
+        if turn in (self.turn, None if self.turn is None else self.turn + 1):
+            previous = self.board
+        tables = maptables.tables()
+        # the same spawn turns as GameWatcher.incoming_spawns
+        spawned = turn != self.turn and \
+          turn % rgs.settings.spawn_every == 1
+        taken = set()
+
+        def same(loc, old):
+            bot = robots[loc]
+            return old is not None and old[2] not in taken and \
+              old[1] == bot.player_id and old[0] >= bot.hp
+
+        moved = []
+        for loc in unknown:
+            if spawned and tables.spawn[tables.index(loc)]:
+                ids[loc] = self.new_id()
+            elif same(loc, previous.get(loc)):
+                ids[loc] = previous[loc][2]
+                taken.add(ids[loc])
+            else:
+                moved.append(loc)
+        for loc in moved:
+            near = sorted((previous[n][0] - robots[loc].hp, n)
+                          for n in tables.neighbors_of(loc)
+                          if same(loc, previous.get(n)))
+            if near:
+                ids[loc] = previous[near[0][1]][2]
+                taken.add(ids[loc])
+            else:
+                ids[loc] = self.new_id()
+        return ids
+
+    def new_id(self):
+        self.last_id -= 1
+        return self.last_id
+
+    def rebuild(self, robots):
+        self.grid = OccupancyGrid(robots)
+        self.influence = InfluenceMap(self.grid, self.player_id,
+                                      self.avg_damage)
+        self.paths = Pathfinder(robots)
+
+    def patch(self, robots, diff):
+        if len(diff.cells) > self.REBUILD_SHARE * max(len(robots), 1):
+            self.rebuild(robots)
+            return
+        self.grid.apply(robots, diff.cells)
+        self.influence.apply(self.grid, diff.cells)
+        if diff.occupancy_changed():
+            self.paths = Pathfinder(robots)
+
+    def remember(self, diff, board):
+        self.history.append(diff)
+        for robot_id in diff.died:
+            self.tracks.pop(robot_id, None)
+        arrivals = [(loc, robot_id) for robot_id, loc in diff.spawned.items()]
+        arrivals.extend((to, robot_id)
+                        for robot_id, (_, to) in diff.moved.items())
+        for loc, robot_id in arrivals:
+            if board[loc][1] == self.player_id:
+                continue
+            if robot_id not in self.tracks:
+                self.tracks[robot_id] = collections.deque(
+                    maxlen=self.HISTORY)
+            self.tracks[robot_id].append(loc)
+
+    def install(self, game):
+        OccupancyGrid._turn.put(game, self.grid)
+        InfluenceMap._turn.put(game, self.influence, self.player_id,
+                               self.avg_damage)
+        Pathfinder._turn.put(game, self.paths)
@@ -0,0 +1,47 @@
+import rg
+
+from grid import OccupancyGrid, TurnCache
+
+
+class WorldView(object):
+    """One player's view of a turn, built once and shared by all of
+    their robots: who's a friend, who's an enemy, and who's closest
+
+    friends and enemies are RobotRecords in location order.
+    """
+    # Rings searched around a location before nearest_enemy falls back
+    # to looking at every enemy
+    RING_SEARCH = 4
+
+    _turn = TurnCache()
+
+    def __init__(self, game, player_id):
+        self.player_id = player_id
+        self.grid = OccupancyGrid.for_game(game)
+        self.friends = self.grid.team(player_id)
+        self.enemies = sorted(self.grid.team(player_id, allies=False),
+                              key=lambda bot: bot.cell)
+        self._nearest = {}
+
+    @classmethod
+    def for_game(cls, game, player_id):
+        """The view for this turn, shared by every caller on the turn"""
+        return cls._turn.get(game, lambda: cls(game, player_id), player_id)
+
+    def nearest_enemy(self, loc):
+        """(enemy, walking distance) for the closest enemy, the first in
+        location order on ties. (None, -1) when there are no enemies."""
+        if loc not in self._nearest:
+            self._nearest[loc] = self.find_nearest(loc)
+        return self._nearest[loc]
+
+    def find_nearest(self, loc):
+        if not self.enemies:
+            return None, -1
+        for r in range(1, self.RING_SEARCH + 1):
+            found = self.grid.on_ring(loc, r, self.player_id, allies=False)
+            if found:
+                return min(found, key=lambda bot: bot.location), r
+        nearest = min(self.enemies,
+                      key=lambda bot: (rg.wdist(loc, bot.location), bot.cell))
+        return nearest, rg.wdist(loc, nearest.location)
@@ -0,0 +1,17 @@
+"""Offline tools for playing, timing and checking the bots
+
+rgkit (the git submodule) and bots/ go on sys.path, so the bots import
+rg, settings and each other the same way they do on the server. Setting
+RG_BOTS_DIR puts another copy of the bots there instead, which is how
+tools.equivalence runs an older revision next to the current one.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOTS_DIR = os.environ.get('RG_BOTS_DIR') or os.path.join(ROOT, 'bots')
+RGKIT_DIR = os.path.join(ROOT, 'rgkit')
+
+for path in (RGKIT_DIR, BOTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,118 @@
+"""Plays matches between the bots locally with rgkit"""
+import ast
+import importlib
+import os
+import random
+import time
+
+from tools import RGKIT_DIR
+
+import game
+import settings as rgs
+
+import maptables
+
+DEFAULT_MAP = os.path.join(RGKIT_DIR, 'maps', 'default.py')
+
+
+class TurnTimer(object):
+    """How long one player's act() calls took, per call and per turn"""
+
+    def __init__(self):
+        self.acts = []
+        self.turns = {}
+
+    def record(self, turn, elapsed):
+        self.acts.append(elapsed)
+        self.turns[turn] = self.turns.get(turn, 0.0) + elapsed
+
+    def turn_times(self):
+        return [self.turns[t] for t in sorted(self.turns)]
+
+
+def load_bot(spec):
+    """The Robot class for a bot spec: a module in bots/, optionally with
+    some of its PARAMS changed, e.g. goose:AVG_DAMAGE=8,STAY_COST=2"""
+    name, params = parse_spec(spec)
+    module = importlib.import_module(name)
+    if params:
+        return module.tuned(**params)
+    return module.Robot
+
+
+def parse_spec(spec):
+    """(module name, {param: value}) from a bot spec"""
+    name, _, rest = spec.partition(':')
+    params = {}
+    for item in rest.split(','):
+        if item:
+            key, _, value = item.partition('=')
+            params[key] = ast.literal_eval(value)
+    return name, params
+
+
+def bot_spec(name, params):
+    """The spec load_bot() turns back into name with params"""
+    if not params:
+        return name
+    return name + ':' + ','.join('{k}={v!r}'.format(k=k, v=params[k])
+                                 for k in sorted(params))
+
+
+def timed(robot_class, timer, recorder=None):
+    """A robot_class instance that records its act() times in timer,
+    and what it saw and did in recorder if there is one"""
+    class Timed(robot_class):
+        def act(self, game_info):
+            start = time.time()
+            try:
+                action = robot_class.act(self, game_info)
+            finally:
+                timer.record(game_info['turn'], time.time() - start)
+            if recorder is not None:
+                recorder.observe(game_info, self.player_id, self.location,
+                                 action)
+            return action
+    return Timed()
+
+
+_map_path = None
+
+
+def use_map(path):
+    """Load a map into rgkit's settings, unless it's already loaded"""
+    global _map_path
+    if path == _map_path:
+        return
+    with open(path) as f:
+        game.init_settings(ast.literal_eval(f.read()))
+    maptables.reset()
+    _map_path = path
+
+
+def loaded_map():
+    """The path of the map use_map() last loaded"""
+    return _map_path
+
+
+def play_match(bots, seed, map_path=DEFAULT_MAP, recorder=None,
+               robot_class=load_bot):
+    """Play one game between bots (player 0, player 1)
+
+    Returns (scores, timers), both in player order. rgkit draws spawns
+    and attack damage from the random module, so seed fixes the game.
+    Pass a tools.replay.Recorder to keep every turn's state and actions.
+    robot_class(spec) gives the class each bot plays with, e.g.
+    tools.worker.batched to have them play from worker processes.
+    """
+    use_map(map_path)
+    random.seed(seed)
+    timers = [TurnTimer() for _ in bots]
+    players = [game.Player(robot=timed(robot_class(name), timer, recorder))
+               for name, timer in zip(bots, timers)]
+    match = game.Game(*players)
+    for _ in range(rgs.settings.max_turns):
+        match.run_turn()
+    if recorder is not None:
+        recorder.close()
+    return match.get_scores(), timers
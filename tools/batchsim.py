@@ -0,0 +1,265 @@
+"""Plays thousands of games at once as stacked numpy arrays
+
+    python -m tools.batchsim simple noop -n 100000 --seed 0
+
+Every game is a row of robot slots (location, hp, owner), and all the
+games advance in lockstep: one spawn, one round of policy decisions and
+one sim.simulate() call per turn covers every game. Spawning, move
+collisions, attacks and suicides all follow the same rules as
+bots/sim.py, with attack damage rolled per robot.
+
+A policy is a function policy(games, me) -> (kind, target): given the
+Games and a (G,) array of the player each game wants moves for, it
+returns (G, N) arrays of sim action kinds and flat target cells. Only
+the entries for that player's live robots are used. Illegal actions
+(not next to the robot, or into a wall) are turned into guards.
+simple and noop are the array versions of bots/simple.py and
+bots/noop.py.
+
+Games are only as random as numpy's generator, so they aren't the same
+games tools.runner plays for a seed. Use this for baselines and sweeps
+over many games, and the runner when a result has to match rgkit.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import rg
+import settings as rgs
+
+import maptables
+import sim
+from sim import GUARD, MOVE, ATTACK
+from tools import arena
+
+CHUNK = 1000
+
+
+class Games(object):
+    """count games of up to capacity robots each, sim.State style
+
+    loc, hp and owner are (games, slots) arrays. An empty slot has 0 hp
+    and sits on the spare cell past the end of the board. Every slot
+    costs time in every game on every turn, so there are only as many
+    as the busiest game needs, and more are added when a spawn runs out.
+    """
+
+    def __init__(self, count, seed=0, capacity=None, tables=None):
+        self.tables = tables or maptables.tables()
+        self.cells = cells = self.tables.size * self.tables.size
+        if capacity is None:
+            capacity = 4 * rgs.settings.spawn_per_player
+        self.loc = np.full((count, capacity), cells, dtype=np.intp)
+        self.hp = np.zeros((count, capacity), dtype=np.int32)
+        self.owner = np.zeros((count, capacity), dtype=np.intp)
+        self.turn = 0
+        self.random = np.random.RandomState(seed)
+
+        self.spawn_cells = np.array([i for i in range(cells)
+                                     if self.tables.spawn[i]], dtype=np.intp)
+        self.is_spawn = np.append(np.array(self.tables.spawn), False)
+        self.around = np.vstack([sim.neighbor_table(self.tables),
+                                 np.full((1, 4), cells, dtype=np.intp)])
+
+    def __len__(self):
+        return len(self.loc)
+
+    @property
+    def alive(self):
+        return self.hp > 0
+
+    def blank(self):
+        """(kind, target) with every robot guarding"""
+        return (np.full(self.loc.shape, GUARD, dtype=np.int8),
+                self.loc.copy())
+
+    def occupancy(self):
+        """(games, cells + 1) owner of the robot on each cell, -1 if none"""
+        grid = np.full((len(self), self.cells + 1), -1, dtype=np.intp)
+        rows = np.arange(len(self))[:, None]
+        grid[rows, self.loc] = np.where(self.alive, self.owner, -1)
+        grid[:, self.cells] = -1
+        return grid
+
+    def neighbors(self):
+        """(games, slots, 4) flat cells next to each robot, padded with
+        the spare cell"""
+        return self.around[self.loc]
+
+    def clear(self, slots):
+        self.loc[slots] = self.cells
+        self.hp[slots] = 0
+
+    def spawn(self):
+        """rgkit's spawn: everyone on a spawn point dies, then each player
+        gets spawn_per_player robots on random spawn points"""
+        self.clear(self.is_spawn[self.loc])
+        count = 2 * rgs.settings.spawn_per_player
+        short = count - np.count_nonzero(~self.alive, axis=1).min()
+        if short > 0:
+            self.grow(short)
+        picks = np.argsort(self.random.rand(len(self),
+                                            len(self.spawn_cells)), axis=1)
+        # empty slots first, in slot order
+        slots = np.argsort(self.alive, axis=1, kind='mergesort')
+        rows = np.arange(len(self))[:, None]
+        slots = slots[:, :count]
+        self.loc[rows, slots] = self.spawn_cells[picks[:, :count]]
+        self.hp[rows, slots] = rgs.settings.robot_hp
+        self.owner[rows, slots] = np.arange(count) % 2
+
+    def grow(self, slots):
+        """Adds slots empty slots to every game"""
+        extra = ((0, 0), (0, slots))
+        self.loc = np.pad(self.loc, extra, 'constant',
+                          constant_values=self.cells)
+        self.hp = np.pad(self.hp, extra, 'constant')
+        self.owner = np.pad(self.owner, extra, 'constant')
+
+    def legal(self, kind, target):
+        """kind and target with moves and attacks that aren't onto a
+        walkable cell next to the robot changed to guards"""
+        reach = (kind == MOVE) | (kind == ATTACK)
+        adjacent = (self.neighbors() == target[..., None]).any(axis=2)
+        bad = reach & ~(adjacent & (target < self.cells))
+        return (np.where(bad, GUARD, kind).astype(np.int8),
+                np.where(bad, self.loc, target))
+
+    def step(self, policies, sides):
+        """One turn of every game. policies[i] moves for sides[i], a (G,)
+        array of player ids."""
+        if self.turn % rgs.settings.spawn_every == 0:
+            self.spawn()
+        kind, target = self.blank()
+        for policy, me in zip(policies, sides):
+            theirs_kind, theirs_target = policy(self, me)
+            mine = self.alive & (self.owner == me[:, None])
+            kind = np.where(mine, theirs_kind, kind)
+            target = np.where(mine, theirs_target, target)
+        kind, target = self.legal(kind, target)
+
+        low, high = rgs.settings.attack_range
+        rolls = self.random.randint(low, high + 1, size=kind.shape)
+        outcome = sim.simulate(self, kind, target, rolls)
+        self.loc = outcome.loc.copy()
+        self.hp = outcome.hp
+        self.clear(~outcome.alive)
+        self.turn += 1
+
+    def scores(self):
+        """(games, 2) robots each player has left"""
+        return np.stack([np.count_nonzero(self.alive & (self.owner == p),
+                                          axis=1) for p in (0, 1)], axis=1)
+
+
+def noop(games, me):
+    """bots/noop.py: always guard"""
+    return games.blank()
+
+
+_toward = {}
+
+
+def toward_center(tables):
+    """(cells + 1,) flat cell of rg.toward(cell, rg.CENTER_POINT)"""
+    if tables not in _toward:
+        cells = tables.size * tables.size
+        table = np.arange(cells + 1, dtype=np.intp)
+        for x in range(tables.size):
+            for y in range(tables.size):
+                table[x * tables.size + y] = tables.index(
+                    rg.toward((x, y), rg.CENTER_POINT))
+        _toward.clear()
+        _toward[tables] = table
+    return _toward[tables]
+
+
+def simple(games, me):
+    """bots/simple.py: guard on the center, otherwise attack an enemy
+    next to us (the first in rg.locs_around order, where the bot takes
+    whichever its robots dict gives it first), otherwise step toward
+    the center"""
+    around = games.neighbors()
+    rows = np.arange(len(games))[:, None, None]
+    near = games.occupancy()[rows, around]
+    enemy = (near >= 0) & (near != games.owner[..., None])
+    fighting = enemy.any(axis=2)
+    first = around[rows[..., 0], np.arange(games.loc.shape[1]),
+                   enemy.argmax(axis=2)]
+
+    center = games.tables.index(rg.CENTER_POINT)
+    kind = np.where(games.loc == center, GUARD,
+                    np.where(fighting, ATTACK, MOVE)).astype(np.int8)
+    target = np.where(fighting, first, toward_center(games.tables)[games.loc])
+    return kind, target
+
+
+POLICIES = {
+    'noop': noop,
+    'simple': simple,
+}
+
+
+def play(policies, count, seed=0, turns=None, swap=True):
+    """Plays count games between two policies, sides swapped in every
+    other game when swap is on. Returns (count, 2) scores, policies[0]'s
+    robots left first."""
+    games = Games(count, seed)
+    me = np.zeros(count, dtype=np.intp)
+    if swap:
+        me[1::2] = 1
+    for _ in range(turns or rgs.settings.max_turns):
+        games.step(policies, (me, 1 - me))
+    scores = games.scores()
+    rows = np.arange(count)
+    return np.stack([scores[rows, me], scores[rows, 1 - me]], axis=1)
+
+
+def run(name_a, name_b, count, seed=0, map_path=arena.DEFAULT_MAP,
+        chunk=CHUNK):
+    """Plays count games in batches of chunk, returns a runner-style
+    summary"""
+    arena.use_map(map_path)
+    policies = (POLICIES[name_a], POLICIES[name_b])
+    started = time.time()
+    starts = range(0, count, chunk)
+    # every chunk gets its own seed drawn from seed, so runs with nearby
+    # seeds don't share games
+    seeds = np.random.RandomState(seed).randint(2 ** 31, size=len(starts))
+    margins = []
+    for start, chunk_seed in zip(starts, seeds):
+        scores = play(policies, min(chunk, count - start), chunk_seed)
+        margins.append(scores[:, 0] - scores[:, 1])
+    elapsed = time.time() - started
+    margins = np.concatenate(margins) if margins else np.zeros(0)
+    return {
+        'bots': [name_a, name_b],
+        'matches': len(margins),
+        'wins': int((margins > 0).sum()),
+        'losses': int((margins < 0).sum()),
+        'draws': int((margins == 0).sum()),
+        'mean_margin': float(margins.mean()) if len(margins) else None,
+        'games_per_sec': len(margins) / elapsed if elapsed else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('bot_a', choices=sorted(POLICIES))
+    parser.add_argument('bot_b', choices=sorted(POLICIES))
+    parser.add_argument('-n', '--matches', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--map', default=arena.DEFAULT_MAP)
+    parser.add_argument('--chunk', type=int, default=CHUNK,
+                        help='games played side by side at once')
+    args = parser.parse_args(argv)
+    summary = run(args.bot_a, args.bot_b, args.matches, args.seed,
+                  args.map, args.chunk)
+    sys.stdout.write(json.dumps({'summary': summary}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""act() latency benchmarks on synthetic boards
+
+    python -m tools.bench                      # print the table
+    python -m tools.bench --save-baseline      # store the numbers
+    python -m tools.bench --tolerance 1.25     # fail if p95 got slower
+
+Every bot plays player 0 on the same reproducible boards: 2 to 100
+robots, spread out or clustered into fights, on the turn after a spawn
+and in the middle of the spawn cycle. Times are per act() call and per
+turn (all of player 0's act() calls on a board). Peak bytes allocated
+need tracemalloc, which Python 2 doesn't have, so every interpreter also
+reports how many more gc-tracked objects are alive after the turn than
+before it (what the bot and its caches held on to).
+
+Times only compare on the machine that made them, so the baseline
+(tools/bench_baseline.json unless --baseline says otherwise) isn't
+checked in: save one on your machine before changing the bots. Without
+one, and for any scenario it has no numbers for, the run fails.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from tools import ROOT, arena, boards
+from tools.stats import summarize
+
+BOTS = ('goose', 'fry', 'simple')
+COUNTS = (2, 10, 25, 50, 75, 100)
+REPEATS = 5
+DEFAULT_BASELINE = os.path.join(ROOT, 'tools', 'bench_baseline.json')
+
+
+def reset_caches(robot_class):
+    """Drop anything a bot remembers between act() calls on a board, so
+    every repeat measures a cold turn"""
+    plans = getattr(robot_class, 'plans', None)
+    if plans is not None:
+        plans.invalidate()
+
+
+def time_turn(robot_class, game):
+    """(per-act seconds, turn seconds, bytes allocated or None, objects
+    kept)"""
+    reset_caches(robot_class)
+    robots = boards.robots_for(game, robot_class)
+    gc.collect()
+    objects = len(gc.get_objects())
+    if tracemalloc:
+        tracemalloc.start()
+    acts = []
+    turn_start = time.time()
+    for robot in robots:
+        start = time.time()
+        robot.act(game)
+        acts.append(time.time() - start)
+    turn = time.time() - turn_start
+    allocated = None
+    if tracemalloc:
+        allocated = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    del robots
+    gc.collect()
+    return acts, turn, allocated, len(gc.get_objects()) - objects
+
+
+def scenarios(counts=COUNTS):
+    for count in counts:
+        for layout in boards.LAYOUTS:
+            for phase in sorted(boards.PHASES):
+                yield count, layout, phase
+
+
+def run(bots=BOTS, counts=COUNTS, repeats=REPEATS):
+    """{scenario name: {'act_ms': .., 'turn_ms': .., 'alloc_kb': ..,
+    'objects': ..}}"""
+    results = {}
+    for name in bots:
+        results.update(run_bot(name, counts, repeats))
+    return results
+
+
+def run_bot(name, counts, repeats):
+    results = {}
+    robot_class = arena.load_bot(name)
+    for count, layout, phase in scenarios(counts):
+        acts, turns, allocs, kept = [], [], [], []
+        for seed in range(repeats):
+            game = boards.synthetic_game(count, layout, phase, seed)
+            act_times, turn_time, allocated, objects = time_turn(
+                robot_class, game)
+            acts.extend(act_times)
+            turns.append(turn_time)
+            kept.append(objects)
+            if allocated is not None:
+                allocs.append(allocated)
+        key = '{b}/{n}/{l}/{p}'.format(b=name, n=count, l=layout, p=phase)
+        results[key] = {
+            'act_ms': to_ms(summarize(acts)),
+            'turn_ms': to_ms(summarize(turns)),
+            'alloc_kb': max(allocs) / 1024.0 if allocs else None,
+            'objects': max(kept),
+        }
+    return results
+
+
+def to_ms(summary):
+    return dict((k, v * 1000.0) for k, v in summary.items()
+                if k != 'n' and v is not None)
+
+
+def regressions(results, baseline, tolerance):
+    """(scenarios whose p95 turn time grew by more than tolerance,
+    scenarios the baseline has no numbers for)"""
+    slower, missing = [], []
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            missing.append(key)
+            continue
+        before = baseline[key]['turn_ms']['p95']
+        after = result['turn_ms']['p95']
+        if after > before * tolerance:
+            slower.append((key, before, after))
+    return slower, missing
+
+
+def print_table(results, out=None):
+    out = out or sys.stdout
+    out.write('{0:<28} {1:>9} {2:>9} {3:>9} {4:>10} {5:>10} {6:>10} '
+              '{7:>9} {8:>8}\n'.format('scenario', 'act p50', 'act p95',
+                                       'act p99', 'turn p50', 'turn p95',
+                                       'turn p99', 'alloc kb', 'objects'))
+    for key, result in sorted(results.items()):
+        act, turn = result['act_ms'], result['turn_ms']
+        alloc = result['alloc_kb']
+        out.write('{0:<28} {1:>9.3f} {2:>9.3f} {3:>9.3f} {4:>10.3f} '
+                  '{5:>10.3f} {6:>10.3f} {7:>9} {8:>8}\n'.format(
+                      key, act['p50'], act['p95'], act['p99'],
+                      turn['p50'], turn['p95'], turn['p99'],
+                      '-' if alloc is None else '{0:.1f}'.format(alloc),
+                      result.get('objects', '-')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--bot', action='append', dest='bots',
+                        help='bot to time, may be repeated (default: '
+                             '{b})'.format(b=', '.join(BOTS)))
+    parser.add_argument('--count', action='append', dest='counts', type=int,
+                        help='robots on the board, may be repeated')
+    parser.add_argument('--repeat', type=int, default=REPEATS,
+                        help='boards per scenario')
+    parser.add_argument('--map', default=arena.DEFAULT_MAP)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='allowed p95 turn time growth vs the baseline')
+    parser.add_argument('--json', help='also write the results here')
+    args = parser.parse_args(argv)
+
+    arena.use_map(args.map)
+    results = run(args.bots or BOTS, args.counts or COUNTS, args.repeat)
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        return 0
+    if not os.path.exists(args.baseline):
+        sys.stderr.write('no baseline at {p}: run with --save-baseline on '
+                         'this machine first\n'.format(p=args.baseline))
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    slower, missing = regressions(results, baseline, args.tolerance)
+    for key, before, after in slower:
+        sys.stderr.write('SLOWER {k}: p95 turn {b:.3f}ms -> {a:.3f}ms\n'
+                         .format(k=key, b=before, a=after))
+    for key in missing:
+        sys.stderr.write('NO BASELINE {k}\n'.format(k=key))
+    return 1 if slower or missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Reproducible synthetic game states for driving act() outside a match"""
+import random
+
+import maptables
+
+
+class AttrDict(dict):
+    """dict with attribute access, like the objects rgkit hands to act()"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+LAYOUTS = ('spread', 'clustered')
+
+# game['turn'] values: the turn right after a spawn (Goose escapes spawn
+# points) and one in the middle of the spawn cycle
+PHASES = {'spawn': 10, 'mid': 15}
+
+
+def make_robot(loc, hp, player_id, robot_id):
+    return AttrDict(location=loc, hp=hp, player_id=player_id,
+                    robot_id=robot_id)
+
+
+def make_game(turn, robots):
+    """A game dict from (loc, hp, player_id, robot_id) tuples"""
+    return AttrDict(turn=turn, robots=AttrDict(
+        (r[0], make_robot(*r)) for r in robots))
+
+
+def synthetic_game(count, layout='spread', phase='mid', seed=0):
+    """count robots split between players 0 and 1
+
+    spread places robots anywhere walkable, clustered packs them around
+    a few fights. The same arguments always give the same board.
+    """
+    rnd = random.Random(repr((count, layout, phase, seed)))
+    tables = maptables.tables()
+    cells = [(x, y) for x in range(tables.size) for y in range(tables.size)
+             if tables.is_walkable((x, y))]
+    count = min(count, len(cells))
+
+    if layout == 'spread':
+        locs = rnd.sample(cells, count)
+    elif layout == 'clustered':
+        centers = rnd.sample(cells, rnd.randint(2, 4))
+        near = sorted(cells, key=lambda c: (min(abs(c[0] - x) + abs(c[1] - y)
+                                                for x, y in centers),
+                                            rnd.random()))
+        locs = near[:count]
+    else:
+        raise ValueError("unknown layout {l}".format(l=layout))
+
+    robots = [(loc, rnd.randint(1, 50), i % 2, i + 1)
+              for i, loc in enumerate(locs)]
+    return make_game(PHASES[phase], robots)
+
+
+def robots_for(game, robot_class, player_id=0):
+    """One act()-ready robot_class instance per robot of player_id"""
+    robots = []
+    for loc, bot in sorted(game['robots'].items()):
+        if bot.player_id == player_id:
+            robot = robot_class()
+            for name in ('location', 'hp', 'player_id', 'robot_id'):
+                setattr(robot, name, bot[name])
+            robots.append(robot)
+    return robots
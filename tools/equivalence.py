@@ -0,0 +1,314 @@
+"""Checks that a change to the bots doesn't change what they do
+
+    python -m tools.equivalence goose fry -n 500
+    python -m tools.equivalence goose --ref HEAD~3 --recorded recs/*.rgr
+    python -m tools.equivalence --repro divergence.json
+
+The reference is bots/ as of a git revision, unpacked into a temporary
+directory: the frozen one in tools/reference.txt unless --ref says
+otherwise. The candidate is bots/ in the working tree, and a run where
+it's the same as the reference stops straight away, since it would
+check nothing. Each runs in its own tools.worker process, and
+both are asked for every robot's action on the same boards:
+
+- random ones from tools.boards, cycling through robot counts, layouts
+  and turn phases, asked of both players
+- the frames of any recordings, in order, so the bots' turn to turn
+  state builds up the way it did in the match
+
+Settings that let a bot's moves depend on the clock (PINNED, e.g.
+Goose's PLAN_BUDGET) are switched off on both sides, so only the code
+can make them differ.
+
+The first board where any robot's action differs ends the run. Fresh
+workers then shrink it, dropping one robot at a time for as long as the
+actions still differ, and it's written out as a JSON reproducer that
+--repro checks again. One JSON line per bot reports the boards checked
+and both sides' act() time.
+"""
+import argparse
+import filecmp
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+from tools import BOTS_DIR, ROOT, arena, boards, worker
+from tools.replay import normalized, read_frames
+
+SIZES = (8, 16, 32, 64)
+# Robot class attributes set on both sides, whichever bot it is
+PINNED = {'PLAN_BUDGET': None}
+REFERENCE_FILE = os.path.join(ROOT, 'tools', 'reference.txt')
+
+
+def reference_rev(path=REFERENCE_FILE):
+    """The frozen reference revision: the first line of path that isn't
+    blank or a # comment"""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                return line
+    raise ValueError("{p} names no revision".format(p=path))
+
+
+def unpack(rev, into):
+    """Writes bots/ as of git revision rev into the directory into and
+    returns the path of the copy"""
+    git = subprocess.Popen(['git', 'archive', '--format=tar', rev, 'bots'],
+                           cwd=ROOT, stdout=subprocess.PIPE)
+    with tarfile.open(fileobj=git.stdout, mode='r|') as tar:
+        tar.extractall(into)
+    if git.wait() != 0:
+        raise ValueError("git can't find bots/ at {r}".format(r=rev))
+    return os.path.join(into, 'bots')
+
+
+def same_bots(a, b):
+    """Do directories a and b hold the same source files"""
+    compare = filecmp.dircmp(a, b, ignore=['__pycache__'])
+    differ = [name for name in compare.left_only + compare.right_only +
+              compare.diff_files + compare.funny_files
+              if not name.endswith(('.pyc', '.pyo'))]
+    return not differ and all(same_bots(os.path.join(a, d),
+                                        os.path.join(b, d))
+                              for d in compare.common_dirs)
+
+
+def random_boards(count, seed=0, sizes=SIZES):
+    """Yields (source, game, player_id) for count boards, each for both
+    players"""
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        layout = boards.LAYOUTS[(i // len(sizes)) % len(boards.LAYOUTS)]
+        phases = sorted(boards.PHASES)
+        phase = phases[(i // len(sizes) // len(boards.LAYOUTS)) % len(phases)]
+        game = boards.synthetic_game(size, layout, phase, seed + i)
+        source = 'synthetic_game({n}, {l!r}, {p!r}, {s})'.format(
+            n=size, l=layout, p=phase, s=seed + i)
+        for player_id in (0, 1):
+            yield source, game, player_id
+
+
+def recorded_boards(path):
+    """Yields (source, game, player_id) for every frame of a recording"""
+    for i, (turn, player_id, robots, _) in enumerate(read_frames(path)):
+        game = boards.make_game(turn, [(loc, hp, pid, rid) for loc, (
+            hp, pid, rid) in robots.items()])
+        yield '{p} frame {i}'.format(p=path, i=i), game, player_id
+
+
+def differences(expected, actual):
+    """{loc: (expected, actual)} for every robot whose actions differ"""
+    return dict((loc, (expected.get(loc), actual.get(loc)))
+                for loc in set(expected).union(actual)
+                if loc not in expected or loc not in actual or
+                normalized(expected[loc]) != normalized(actual[loc]))
+
+
+class Pair(object):
+    """The reference and candidate workers for one bot spec"""
+
+    def __init__(self, spec, ref_dir, map_path):
+        self.spec = spec
+        self.map_path = os.path.abspath(map_path)
+        self.reference = worker.Worker(spec, ref_dir, PINNED)
+        self.candidate = worker.Worker(spec, pinned=PINNED)
+        self.start()
+
+    def start(self):
+        """A new match for both players on both sides"""
+        for side in (self.reference, self.candidate):
+            for player_id in (0, 1):
+                side.start_match(self.map_path, player_id)
+
+    def ask(self, game, player_id):
+        """(reference actions, candidate actions, differences)"""
+        expected = self.reference.act_all(game, player_id)
+        actual = self.candidate.act_all(game, player_id)
+        return expected, actual, differences(expected, actual)
+
+    def close(self):
+        self.reference.close()
+        self.candidate.close()
+
+
+def shrink(spec, ref_dir, map_path, game, player_id):
+    """The smallest game (by dropping robots one at a time) that still
+    makes fresh workers disagree, or None when game alone doesn't"""
+    pair = Pair(spec, ref_dir, map_path)
+    try:
+        if not pair.ask(game, player_id)[2]:
+            return None
+        robots = sorted(worker.encode(game['robots']))
+        dropped = True
+        while dropped:
+            dropped = False
+            for robot in list(robots):
+                rest = [r for r in robots if r is not robot]
+                if not any(r[2] == player_id for r in rest):
+                    continue
+                if pair.ask(boards.make_game(game['turn'], rest),
+                            player_id)[2]:
+                    robots = rest
+                    dropped = True
+        return boards.make_game(game['turn'], robots)
+    finally:
+        pair.close()
+
+
+def reproducer(spec, rev, map_path, source, game, player_id, expected,
+               actual, standalone):
+    pairs = lambda actions: sorted([list(loc), action]
+                                   for loc, action in actions.items())
+    return {
+        'bot': spec,
+        'ref': rev,
+        'map': os.path.abspath(map_path),
+        'source': source,
+        'standalone': standalone,
+        'turn': game['turn'],
+        'player': player_id,
+        'robots': sorted([list(loc), hp, pid, rid] for loc, hp, pid, rid in
+                         worker.encode(game['robots'])),
+        'reference': pairs(expected),
+        'candidate': pairs(actual),
+    }
+
+
+def check(spec, rev, ref_dir, map_path, sources, out_path):
+    """Runs every board from sources past both sides of spec, stopping at
+    the first difference. Returns the report."""
+    pair = Pair(spec, ref_dir, map_path)
+    report = {'bot': spec, 'ref': rev, 'boards': 0, 'divergence': None}
+    try:
+        for board_source in sources:
+            for source, game, player_id in board_source():
+                expected, actual, diffs = pair.ask(game, player_id)
+                report['boards'] += 1
+                if diffs:
+                    report['divergence'] = diverged(
+                        spec, rev, ref_dir, map_path, source, game,
+                        player_id, expected, actual, out_path)
+                    break
+            if report['divergence']:
+                break
+            # recordings don't carry on from each other
+            pair.start()
+        timings = [pair.reference.stats(), pair.candidate.stats()]
+    finally:
+        pair.close()
+
+    report['acts'] = timings[1]['acts']
+    report['reference_seconds'] = timings[0]['seconds']
+    report['candidate_seconds'] = timings[1]['seconds']
+    if timings[1]['seconds']:
+        report['speedup'] = timings[0]['seconds'] / timings[1]['seconds']
+    return report
+
+
+def diverged(spec, rev, ref_dir, map_path, source, game, player_id,
+             expected, actual, out_path):
+    """Shrinks a diverging board, saves its reproducer to out_path and
+    returns a summary of it"""
+    small = shrink(spec, ref_dir, map_path, game, player_id)
+    standalone = small is not None
+    if standalone:
+        pair = Pair(spec, ref_dir, map_path)
+        try:
+            expected, actual, _ = pair.ask(small, player_id)
+        finally:
+            pair.close()
+        game = small
+    repro = reproducer(spec, rev, map_path, source, game, player_id,
+                       expected, actual, standalone)
+    with open(out_path, 'w') as f:
+        json.dump(repro, f, indent=2, sort_keys=True)
+    return {
+        'source': source,
+        'reproducer': out_path,
+        'robots': len(repro['robots']),
+        'standalone': standalone,
+        'first': sorted([list(loc), before, after] for loc, (
+            before, after) in differences(expected, actual).items())[:1],
+    }
+
+
+def repro(path, rev=None):
+    """Checks a saved reproducer again. Returns its differences."""
+    with open(path) as f:
+        saved = json.load(f)
+    rev = rev or saved['ref']
+    arena.use_map(saved['map'])
+    game = boards.make_game(saved['turn'], [
+        (tuple(loc), hp, pid, rid) for loc, hp, pid, rid in saved['robots']])
+    tmp = tempfile.mkdtemp(prefix='rg-ref-')
+    try:
+        pair = Pair(saved['bot'], unpack(rev, tmp), saved['map'])
+        try:
+            return pair.ask(game, saved['player'])[2]
+        finally:
+            pair.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('bots', nargs='*', default=['goose', 'fry'],
+                        help='bot specs to check (default: goose fry)')
+    parser.add_argument('--ref', help='git revision of the reference bots '
+                                      '(default: the one in '
+                                      'tools/reference.txt, or the '
+                                      'reproducer\'s)')
+    parser.add_argument('-n', '--boards', type=int, default=200,
+                        help='random boards per bot')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--recorded', nargs='*', default=[],
+                        metavar='RECORDING', help='tools.runner --record '
+                                                  'files to check as well')
+    parser.add_argument('--map', default=arena.DEFAULT_MAP)
+    parser.add_argument('--out', default='divergence.json',
+                        help='where to write the first diverging board')
+    parser.add_argument('--repro', metavar='FILE',
+                        help='only check a saved reproducer again')
+    args = parser.parse_args(argv)
+
+    if args.repro:
+        diffs = repro(args.repro, args.ref)
+        for loc, (before, after) in sorted(diffs.items()):
+            sys.stdout.write(json.dumps({'loc': loc, 'reference': before,
+                                         'candidate': after}) + '\n')
+        return 1 if diffs else 0
+
+    rev = args.ref or reference_rev()
+    arena.use_map(args.map)
+    sources = [lambda: random_boards(args.boards, args.seed)]
+    sources.extend((lambda path=path: recorded_boards(path))
+                   for path in args.recorded)
+    tmp = tempfile.mkdtemp(prefix='rg-ref-')
+    diverging = False
+    try:
+        ref_dir = unpack(rev, tmp)
+        if same_bots(ref_dir, BOTS_DIR):
+            sys.stderr.write('bots/ is the same as at {r}, so there is '
+                             'nothing to check\n'.format(r=rev))
+            return 2
+        for spec in args.bots:
+            report = check(spec, rev, ref_dir, args.map, sources,
+                           args.out)
+            diverging = diverging or bool(report['divergence'])
+            sys.stdout.write(json.dumps(report) + '\n')
+            if report['divergence']:
+                break
+    finally:
+        shutil.rmtree(tmp)
+    return 1 if diverging else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
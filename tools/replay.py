@@ -0,0 +1,198 @@
+"""Records the game states the bots saw and replays them into any bot
+
+    python -m tools.runner goose fry -n 50 --record recordings/
+    python -m tools.replay recordings/match-7.rgr --bot goose --player 0
+
+A recording is a zlib-compressed stream of frames, one per turn per
+player: the robots that changed since that player's previous frame
+(delta encoded, so quiet turns cost a few bytes) and the actions the
+player's robots returned. Replaying rebuilds each frame's game, calls
+the bot's act() for every robot that acted, and diffs the answers.
+
+Only a bot whose moves depend on nothing but the boards it has seen
+replays its own recordings without differences. Goose does, unless its
+PLAN_BUDGET is set: then how many robots it plans depends on the clock.
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+import zlib
+
+from tools import arena, boards
+
+MAGIC = 'RGR1'
+ACTIONS = ('guard', 'move', 'attack', 'suicide')
+NO_CELL = 0xFFFF
+NO_ID = -1
+
+FRAME = struct.Struct('<HBHHH')   # turn, player, removed, changed, actions
+CELL = struct.Struct('<H')
+ROBOT = struct.Struct('<HhBi')    # cell, hp, player_id, robot_id
+ACTION = struct.Struct('<HBH')    # cell, action, target cell
+
+
+class Recorder(object):
+    """Writes the frames of one match to path
+
+    observe() is called for every act() with the game it was given and
+    the action returned. A player's frame is written once that player
+    moves on to the next turn (or the recorder is closed).
+    """
+
+    def __init__(self, path, size=19):
+        self.size = size
+        self.out = open(path, 'wb')
+        self.zip = zlib.compressobj()
+        self.write(MAGIC + struct.pack('<B', size))
+        self.previous = {}
+        self.frames = {}
+
+    def write(self, data):
+        self.out.write(self.zip.compress(data))
+
+    def cell(self, loc):
+        if loc is None:
+            return NO_CELL
+        return loc[0] * self.size + loc[1]
+
+    def observe(self, game, player_id, loc, action):
+        frame = self.frames.get(player_id)
+        if frame is None or frame[0] != game['turn']:
+            self.flush(player_id)
+            frame = self.frames[player_id] = (game['turn'], game['robots'],
+                                              {})
+        frame[2][loc] = action
+
+    def flush(self, player_id):
+        if player_id not in self.frames:
+            return
+        turn, robots, actions = self.frames.pop(player_id)
+        board = dict((self.cell(loc), (bot.hp, bot.player_id,
+                                       bot.get('robot_id', NO_ID)))
+                     for loc, bot in robots.items())
+        before = self.previous.get(player_id, {})
+        removed = [c for c in before if c not in board]
+        changed = [(c, r) for c, r in board.items() if before.get(c) != r]
+
+        data = [FRAME.pack(turn, player_id, len(removed), len(changed),
+                           len(actions))]
+        data.extend(CELL.pack(c) for c in removed)
+        data.extend(ROBOT.pack(c, hp, owner,
+                               NO_ID if robot_id is None else robot_id)
+                    for c, (hp, owner, robot_id) in changed)
+        for loc, action in sorted(actions.items()):
+            target = action[1] if len(action) > 1 else None
+            data.append(ACTION.pack(self.cell(loc), ACTIONS.index(action[0]),
+                                    self.cell(target)))
+        self.write(''.join(data))
+
+        self.previous[player_id] = board
+
+    def close(self):
+        for player_id in sorted(self.frames):
+            self.flush(player_id)
+        self.out.write(self.zip.flush())
+        self.out.close()
+
+
+def read_frames(path):
+    """Yields (turn, player_id, robots, actions) for every frame
+
+    robots maps loc -> (hp, player_id, robot_id) for the full board that
+    player saw, actions maps loc -> the action that robot returned.
+    """
+    with open(path, 'rb') as f:
+        data = zlib.decompress(f.read())
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("{p} isn't a robotgame recording".format(p=path))
+    size = struct.unpack_from('<B', data, len(MAGIC))[0]
+    offset = len(MAGIC) + 1
+    to_loc = lambda c: None if c == NO_CELL else (c // size, c % size)
+
+    boards_seen = {}
+    while offset < len(data):
+        turn, player_id, n_removed, n_changed, n_actions = \
+            FRAME.unpack_from(data, offset)
+        offset += FRAME.size
+        board = dict(boards_seen.get(player_id, {}))
+        for _ in range(n_removed):
+            del board[CELL.unpack_from(data, offset)[0]]
+            offset += CELL.size
+        for _ in range(n_changed):
+            c, hp, owner, robot_id = ROBOT.unpack_from(data, offset)
+            board[c] = (hp, owner, None if robot_id == NO_ID else robot_id)
+            offset += ROBOT.size
+        actions = {}
+        for _ in range(n_actions):
+            c, code, target = ACTION.unpack_from(data, offset)
+            action = [ACTIONS[code]]
+            if target != NO_CELL:
+                action.append(to_loc(target))
+            actions[to_loc(c)] = action
+            offset += ACTION.size
+        boards_seen[player_id] = board
+
+        robots = dict((to_loc(c), r) for c, r in board.items())
+        yield turn, player_id, robots, actions
+
+
+def normalized(action):
+    """('move', (x, y)) whether the bot used lists or tuples"""
+    if len(action) > 1:
+        return (action[0], tuple(action[1]))
+    return (action[0],)
+
+
+def replay(path, bot, player_id=None):
+    """Feeds every recorded frame into bot (a module in bots/)
+
+    Returns a report with the replayed act() time and every action that
+    differs from the recording.
+    """
+    robot_class = arena.load_bot(bot)
+    report = {'frames': 0, 'acts': 0, 'seconds': 0.0, 'diffs': []}
+    for turn, owner, robots, actions in read_frames(path):
+        if player_id is not None and owner != player_id:
+            continue
+        game = boards.make_game(turn, [(loc, hp, pid, rid) for loc, (
+            hp, pid, rid) in robots.items()])
+        acting = [r for r in boards.robots_for(game, robot_class, owner)
+                  if r.location in actions]
+        report['frames'] += 1
+        for robot in acting:
+            start = time.time()
+            action = robot.act(game)
+            report['seconds'] += time.time() - start
+            report['acts'] += 1
+            recorded = actions[robot.location]
+            if normalized(action) != normalized(recorded):
+                report['diffs'].append({
+                    'turn': turn, 'player': owner, 'loc': robot.location,
+                    'recorded': recorded, 'replayed': action})
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('recordings', nargs='+')
+    parser.add_argument('--bot', required=True, help='module in bots/')
+    parser.add_argument('--player', type=int, default=None,
+                        help='only replay this player\'s frames')
+    parser.add_argument('--map', default=arena.DEFAULT_MAP,
+                        help='the map the recordings were played on')
+    args = parser.parse_args(argv)
+
+    arena.use_map(args.map)
+    differs = False
+    for path in args.recordings:
+        report = replay(path, args.bot, args.player)
+        report['recording'] = path
+        differs = differs or bool(report['diffs'])
+        sys.stdout.write(json.dumps(report) + '\n')
+    return 1 if differs else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
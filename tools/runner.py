@@ -0,0 +1,158 @@
+"""Batch runner: plays N matches between two bots on a process pool
+
+    python -m tools.runner goose fry -n 1000 -j 8 --seed 0
+    python -m tools.runner goose:STAY_COST=2 goose -n 200
+
+Every finished match is written to stdout as a JSON line, followed by
+a final {"summary": ...} line. Results are from bot A's point of view.
+Bots swap sides every other match, and each match's seed picks its map
+(when several are given) as well as rgkit's spawns and damage rolls.
+With --record DIR every match is also saved for tools.replay, and with
+--profile FILE the bots' branch and helper counters (bots/counters.py)
+are added up over the batch and written to FILE as a flat report.
+With --worker each pool process plays the bots from long-lived
+tools.worker processes that answer for the whole team once per turn.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+
+from tools import arena, worker
+import counters
+from tools.replay import Recorder
+from tools.stats import summarize
+
+
+_robot_class = arena.load_bot
+
+
+def silence(profile=False, workers=False):
+    """Pool initializer: keeps anything rgkit or a bot prints out of the
+    JSON lines on stdout, turns the bots' counters on and plays the bots
+    from tools.worker processes if asked"""
+    global _robot_class
+    sys.stdout = open(os.devnull, 'w')
+    if profile:
+        counters.enable()
+    if workers:
+        _robot_class = worker.batched
+
+
+def match_jobs(bot_a, bot_b, count, seed, maps, record_dir=None):
+    for i in range(count):
+        match_seed = seed + i
+        map_path = random.Random(match_seed).choice(maps)
+        yield (i, bot_a, bot_b, match_seed, map_path, i % 2 == 1, record_dir)
+
+
+def run_job(job):
+    index, bot_a, bot_b, seed, map_path, swapped, record_dir = job
+    bots = (bot_b, bot_a) if swapped else (bot_a, bot_b)
+    recorder = None
+    if record_dir:
+        recorder = Recorder(os.path.join(record_dir,
+                                         'match-{i}.rgr'.format(i=index)))
+    counters.clear()
+    scores, timers = arena.play_match(bots, seed, map_path, recorder,
+                                      _robot_class)
+    if swapped:
+        scores, timers = scores[::-1], timers[::-1]
+
+    margin = scores[0] - scores[1]
+    result = {
+        'match': index,
+        'seed': seed,
+        'map': os.path.basename(map_path),
+        'bots': [bot_a, bot_b],
+        'a_player': 1 if swapped else 0,
+        'scores': list(scores),
+        'margin': margin,
+        'result': 'win' if margin > 0 else 'loss' if margin < 0 else 'draw',
+        'turn_ms': [ms(summarize(t.turn_times())) for t in timers],
+        'act_ms': [ms(summarize(t.acts)) for t in timers],
+    }
+    samples = [t.turn_times() for t in timers]
+    return result, samples, counters.report()
+
+
+def ms(summary):
+    return dict((k, v * 1000.0 if k != 'n' and v is not None else v)
+                for k, v in summary.items())
+
+
+def run(bot_a, bot_b, count, seed=0, maps=(arena.DEFAULT_MAP,), jobs=None,
+        record_dir=None, out=sys.stdout, profile=None, workers=False):
+    """Play the matches, stream results to out and return the summary"""
+    pool = multiprocessing.Pool(jobs, initializer=silence,
+                                initargs=(profile is not None, workers))
+    totals = {'win': 0, 'loss': 0, 'draw': 0}
+    margins = []
+    turn_times = [[], []]
+    profiled = {}
+    try:
+        for result, samples, report in pool.imap_unordered(
+                run_job, match_jobs(bot_a, bot_b, count, seed, list(maps),
+                                    record_dir)):
+            counters.merge(profiled, report)
+            totals[result['result']] += 1
+            margins.append(result['margin'])
+            for side, times in enumerate(samples):
+                turn_times[side].extend(times)
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+    finally:
+        pool.terminate()
+
+    summary = {
+        'bots': [bot_a, bot_b],
+        'matches': len(margins),
+        'wins': totals['win'],
+        'losses': totals['loss'],
+        'draws': totals['draw'],
+        'mean_margin': sum(margins) / float(len(margins)) if margins else None,
+        'turn_ms': [ms(summarize(t)) for t in turn_times],
+    }
+    out.write(json.dumps({'summary': summary}) + '\n')
+    if profile:
+        with open(profile, 'w') as f:
+            counters.write_report(profiled, f)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('bot_a', help='module in bots/, e.g. goose, or '
+                                      'goose:AVG_DAMAGE=8 to change some of '
+                                      'its PARAMS')
+    parser.add_argument('bot_b', help='module in bots/, e.g. fry')
+    parser.add_argument('-n', '--matches', type=int, default=100)
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first match, the rest count up')
+    parser.add_argument('--map', action='append', dest='maps',
+                        help='map file, may be repeated (default: rgkit '
+                             'default map)')
+    parser.add_argument('--record', metavar='DIR',
+                        help='save every match here for tools.replay')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write the bots\' branch and helper timings '
+                             'here')
+    parser.add_argument('--worker', action='store_true',
+                        help='play the bots from long-lived worker '
+                             'processes, one message per team per turn')
+    args = parser.parse_args(argv)
+    if args.worker and args.profile:
+        parser.error("--profile can't see inside --worker processes")
+    if args.record and not os.path.isdir(args.record):
+        os.makedirs(args.record)
+    run(args.bot_a, args.bot_b, args.matches, args.seed,
+        args.maps or [arena.DEFAULT_MAP], args.jobs, args.record,
+        profile=args.profile, workers=args.worker)
+
+
+if __name__ == '__main__':
+    main()
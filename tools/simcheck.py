@@ -0,0 +1,195 @@
+"""Checks bots/sim.py against a plain-Python version of rgkit's rules
+
+    python -m tools.simcheck -n 300 --seed 3
+
+Every trial puts 2 to 14 robots with random hp and owners on cells near
+each other, so there's plenty of contact, and gives them a few rounds of
+random actions (guards, moves, attacks and suicides onto walkable cells
+next to them). Each round goes through sim.simulate() once with the
+fixed expected damage and once with a random roll per robot, and every
+robot's end cell and hp are compared with reference(), which resolves
+the turn one robot at a time. The first mismatch is printed and the
+exit status is 1. Needs numpy.
+"""
+import argparse
+import collections
+import json
+import random
+import sys
+
+import numpy as np
+
+import settings as rgs
+
+import maptables
+import sim
+from tools import arena
+
+ACTIONS = ('guard', 'move', 'move', 'attack', 'suicide')
+ROUNDS = 6
+SPREAD = 3
+MAX_ROBOTS = 14
+
+
+def resolve_moves(locs, actions):
+    """{loc: end cell} once every move that can't happen has failed"""
+    wanted = dict((loc, tuple(actions[loc][1])
+                   if actions[loc][0] == 'move' else loc) for loc in locs)
+    dest = dict(wanted)
+    moving = set(loc for loc in locs if actions[loc][0] == 'move')
+    while moving:
+        claims = collections.Counter(dest.values())
+        ok = set(loc for loc in moving
+                 if claims[dest[loc]] == 1 and dest[loc] not in wanted)
+        # behind a robot that gets away itself, but never around a ring
+        changed = True
+        while changed:
+            changed = False
+            for loc in moving - ok:
+                if claims[dest[loc]] == 1 and dest[loc] in ok:
+                    ok.add(loc)
+                    changed = True
+        failed = moving - ok
+        if not failed:
+            break
+        for loc in failed:
+            dest[loc] = loc
+        moving -= failed
+    return wanted, dest
+
+
+def reference(robots, actions, damage):
+    """{loc: (end cell, hp)} for robots, (loc, hp, player_id) tuples,
+    after actions, {loc: action}. damage is {loc: attack damage}."""
+    tables = maptables.tables()
+    locs = [r[0] for r in robots]
+    owner = dict((r[0], r[2]) for r in robots)
+    actions = dict((loc, actions.get(loc, ['guard'])) for loc in locs)
+    wanted, dest = resolve_moves(locs, actions)
+
+    bumped = set(wanted[loc] for loc in locs if wanted[loc] != dest[loc])
+    contending = collections.defaultdict(set)
+    for loc in locs:
+        if actions[loc][0] == 'move':
+            contending[wanted[loc]].add(loc)
+        contending[dest[loc]].add(loc)
+
+    result = {}
+    for loc, hp, player_id in robots:
+        kind = actions[loc][0]
+        collision = 0
+        if kind != 'guard':
+            for cell in bumped:
+                if loc in contending[cell]:
+                    collision += rgs.settings.collision_damage * sum(
+                        1 for other in contending[cell]
+                        if owner[other] != player_id)
+        hurt = 0
+        for other in locs:
+            if owner[other] == player_id:
+                continue
+            action = actions[other]
+            if action[0] == 'attack' and tuple(action[1]) == dest[loc]:
+                hurt += damage[other]
+            if action[0] == 'suicide' and \
+              dest[loc] in tables.neighbors_of(other):
+                hurt += rgs.settings.suicide_damage
+        if kind == 'guard':
+            hurt //= 2
+        hp = 0 if kind == 'suicide' else max(hp - collision - hurt, 0)
+        result[loc] = (dest[loc], hp)
+    return result
+
+
+def random_board(rnd, cells):
+    """(loc, hp, player_id) tuples bunched around a random cell"""
+    cx, cy = rnd.choice(cells)
+    near = [c for c in cells if abs(c[0] - cx) + abs(c[1] - cy) <= SPREAD]
+    count = min(len(near), rnd.randint(2, MAX_ROBOTS))
+    return sorted((loc, rnd.randint(1, rgs.settings.robot_hp),
+                   rnd.randint(0, 1)) for loc in rnd.sample(near, count))
+
+
+def random_actions(rnd, robots, tables):
+    actions = {}
+    for loc, _, _ in robots:
+        kind = rnd.choice(ACTIONS)
+        if kind in ('move', 'attack'):
+            around = tables.neighbors_of(loc)
+            if around:
+                actions[loc] = [kind, rnd.choice(around)]
+        else:
+            actions[loc] = [kind]
+    return actions
+
+
+def compare(state, joint, outcome, damage):
+    """The first (k, loc, simulated, reference) that differs, or None"""
+    size = state.tables.size
+    for k, actions in enumerate(joint):
+        expected = reference(state_robots(state), actions, damage[k])
+        for i, loc in enumerate(state.locs):
+            got = (divmod(int(outcome.loc[k, i]), size),
+                   int(outcome.hp[k, i]))
+            if got != expected[loc]:
+                return k, loc, got, expected[loc]
+    return None
+
+
+def state_robots(state):
+    return [(loc, int(state.hp[i]), int(state.owner[i]))
+            for i, loc in enumerate(state.locs)]
+
+
+def check(trials, seed=0, rounds=ROUNDS):
+    """Runs trials random boards through both, returns a report with the
+    first mismatch if there is one"""
+    tables = maptables.tables()
+    rnd = random.Random(seed)
+    cells = [(x, y) for x in range(tables.size) for y in range(tables.size)
+             if tables.walkable[tables.index((x, y))]]
+    low, high = rgs.settings.attack_range
+    report = {'trials': 0, 'rounds': 0, 'mismatch': None}
+    for trial in range(trials):
+        robots = random_board(rnd, cells)
+        state = sim.State(robots)
+        joint = [random_actions(rnd, robots, tables) for _ in range(rounds)]
+        kind, target = state.encode(joint)
+
+        expected = (low + high) // 2
+        fixed = [dict((loc, expected) for loc in state.locs)] * rounds
+        rolls = np.array([[rnd.randint(low, high) for _ in state.locs]
+                          for _ in joint], dtype=np.int32)
+        rolled = [dict(zip(state.locs, row)) for row in rolls.tolist()]
+
+        for damage, argument in ((fixed, None), (rolled, rolls)):
+            outcome = sim.simulate(state, kind, target, argument)
+            bad = compare(state, joint, outcome, damage)
+            if bad is not None:
+                k, loc, got, want = bad
+                report['mismatch'] = {
+                    'trial': trial, 'loc': loc, 'simulated': got,
+                    'reference': want, 'robots': robots,
+                    'actions': sorted(joint[k].items()),
+                    'damage': sorted(damage[k].items()),
+                }
+                return report
+        report['trials'] += 1
+        report['rounds'] += 2 * rounds
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--trials', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--map', default=arena.DEFAULT_MAP)
+    args = parser.parse_args(argv)
+    arena.use_map(args.map)
+    report = check(args.trials, args.seed)
+    sys.stdout.write(json.dumps(report) + '\n')
+    return 1 if report['mismatch'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
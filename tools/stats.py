@@ -0,0 +1,19 @@
+"""Small summary statistics for timings and results"""
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of samples (pct in 0..100)"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = int(round(pct / 100.0 * (len(ordered) - 1)))
+    return ordered[rank]
+
+
+def summarize(samples, pcts=(50, 95, 99)):
+    """{'p50': .., 'p95': .., 'p99': .., 'max': .., 'n': ..}"""
+    summary = dict(('p{p}'.format(p=p), percentile(samples, p))
+                   for p in pcts)
+    summary['max'] = max(samples) if samples else None
+    summary['n'] = len(samples)
+    return summary
@@ -0,0 +1,230 @@
+"""Self-play tuner for the bots' constants
+
+    python -m tools.tuner goose -g 30 -p 16 --games 40 -j 8
+    python -m tools.tuner fry --opponent goose --checkpoint fry-tune.json
+
+A genetic search over the constants a bot lists in its PARAMS. Every
+generation's candidates play the opponent (the untuned bot itself unless
+given) on the same seeds, swapping sides every other game, and are
+scored by their mean score margin. Games go out to all cores a round at
+a time, and after each round a candidate whose margin is clearly below
+the leader's (the upper end of its confidence interval under the lower
+end of the leader's) stops playing. The best quarter survive into the
+next generation, which is filled up by crossing and mutating them.
+
+The search is saved to the checkpoint after every generation and picks
+up from there when the checkpoint already exists. One JSON line per
+generation goes to stdout.
+"""
+import argparse
+import importlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from tools import arena, runner
+
+ROUND = 4
+CUTOFF_Z = 2.0
+MUTATION = 0.2
+
+
+class Space(object):
+    """The ranges in a bot's PARAMS. Parameters with whole number bounds
+    only take whole numbers."""
+
+    def __init__(self, params):
+        self.bounds = dict(params)
+
+    def clip(self, name, value):
+        low, high = self.bounds[name]
+        value = min(max(value, low), high)
+        if isinstance(low, int) and isinstance(high, int):
+            return int(round(value))
+        return round(value, 3)
+
+    def random(self, rnd):
+        return dict((name, self.clip(name, rnd.uniform(low, high)))
+                    for name, (low, high) in self.bounds.items())
+
+    def mutate(self, params, rnd, scale=MUTATION):
+        """Nudges every parameter by a normal step of scale times its range"""
+        child = {}
+        for name, (low, high) in self.bounds.items():
+            step = rnd.gauss(0, scale * (high - low))
+            child[name] = self.clip(name, params[name] + step)
+        return child
+
+    def crossover(self, a, b, rnd):
+        return dict((name, a[name] if rnd.random() < 0.5 else b[name])
+                    for name in self.bounds)
+
+
+def stats(margins):
+    """(mean, standard error) of a candidate's margins so far"""
+    n = len(margins)
+    mean = sum(margins) / float(n)
+    if n < 2:
+        return mean, float('inf')
+    var = sum((m - mean) ** 2 for m in margins) / (n - 1)
+    return mean, math.sqrt(var / n)
+
+
+def evaluate(pool, bot, opponent, population, games, seed, maps,
+             round_size=ROUND):
+    """Plays every candidate against opponent, dropping the clearly bad
+    ones after each round. Returns each candidate's list of margins."""
+    margins = [[] for _ in population]
+    playing = range(len(population))
+    for start in range(0, games, round_size):
+        count = min(round_size, games - start)
+        jobs = []
+        for c in playing:
+            spec = arena.bot_spec(bot, population[c])
+            for i, job in enumerate(runner.match_jobs(
+                    spec, opponent, count, seed + start, maps)):
+                # matches of one candidate are numbered after each other,
+                # and still swap sides every other game
+                jobs.append((c * games + start + i, job[1], job[2], job[3],
+                             job[4], (start + i) % 2 == 1, None))
+        for result, _, _ in pool.imap_unordered(runner.run_job, jobs):
+            margins[result['match'] // games].append(result['margin'])
+        playing = still_playing(margins, playing)
+    return margins
+
+
+def still_playing(margins, playing, z=CUTOFF_Z):
+    """The candidates not clearly worse than the current leader"""
+    scored = dict((c, stats(margins[c])) for c in playing)
+    leader = max(playing, key=lambda c: scored[c][0])
+    mean, err = scored[leader]
+    floor = mean - z * err
+    return [c for c in playing
+            if scored[c][0] + z * scored[c][1] >= floor]
+
+
+def next_generation(space, population, margins, rnd):
+    """The best quarter, topped up with their mutated offspring"""
+    ranked = sorted(range(len(population)),
+                    key=lambda c: stats(margins[c])[0], reverse=True)
+    elite = [population[c] for c in ranked[:max(1, len(population) // 4)]]
+    children = list(elite)
+    while len(children) < len(population):
+        a, b = rnd.choice(elite), rnd.choice(elite)
+        children.append(space.mutate(space.crossover(a, b, rnd), rnd))
+    return children
+
+
+def first_generation(space, defaults, size, rnd):
+    """The bot's current constants, and random ones around the space"""
+    return [dict(defaults)] + [space.random(rnd) for _ in range(size - 1)]
+
+
+def save(path, state):
+    """Write state to path without ever leaving half a file behind"""
+    partial = path + '.partial'
+    with open(partial, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.rename(partial, path)
+
+
+def tune(bot, opponent=None, generations=20, size=16, games=20, seed=0,
+         maps=(arena.DEFAULT_MAP,), jobs=None, checkpoint=None,
+         round_size=ROUND, out=sys.stdout):
+    """Run (or resume) the search, returns the final state"""
+    module = importlib.import_module(bot)
+    space = Space(module.PARAMS)
+    opponent = opponent or bot
+
+    state = None
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        if state['bot'] != bot or state['opponent'] != opponent:
+            raise ValueError("{c} is a {b} vs {o} search".format(
+                c=checkpoint, b=state['bot'], o=state['opponent']))
+    if state is None:
+        rnd = random.Random('{s}/start'.format(s=seed))
+        state = {
+            'bot': bot, 'opponent': opponent, 'seed': seed,
+            'generation': 0, 'games_played': 0, 'history': [],
+            'population': first_generation(space, module.defaults(), size,
+                                           rnd),
+            'best': None,
+        }
+
+    pool = multiprocessing.Pool(jobs, initializer=runner.silence)
+    try:
+        while state['generation'] < generations:
+            generation = state['generation']
+            population = state['population']
+            started = time.time()
+            margins = evaluate(pool, bot, opponent, population, games,
+                               state['seed'] + generation * games,
+                               list(maps), round_size)
+            played = sum(len(m) for m in margins)
+            elapsed = time.time() - started
+
+            leader = max(range(len(population)),
+                         key=lambda c: (len(margins[c]),
+                                        stats(margins[c])[0]))
+            mean, err = stats(margins[leader])
+            summary = {
+                'generation': generation,
+                'games': played,
+                'games_saved': len(population) * games - played,
+                'games_per_sec': played / elapsed if elapsed else None,
+                'best_margin': mean,
+                'best_stderr': err,
+                'best': population[leader],
+                'best_spec': arena.bot_spec(bot, population[leader]),
+            }
+            out.write(json.dumps(summary) + '\n')
+            out.flush()
+
+            rnd = random.Random('{s}/{g}'.format(s=state['seed'],
+                                                 g=generation))
+            state['population'] = next_generation(space, population,
+                                                  margins, rnd)
+            state['generation'] = generation + 1
+            state['games_played'] += played
+            state['history'].append(summary)
+            state['best'] = summary
+            if checkpoint:
+                save(checkpoint, state)
+    finally:
+        pool.terminate()
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('bot', help='module in bots/ with PARAMS to tune')
+    parser.add_argument('--opponent', help='bot spec to play against '
+                                           '(default: the untuned bot)')
+    parser.add_argument('-g', '--generations', type=int, default=20)
+    parser.add_argument('-p', '--population', type=int, default=16)
+    parser.add_argument('--games', type=int, default=20,
+                        help='games per candidate per generation, at most')
+    parser.add_argument('--round', type=int, default=ROUND,
+                        help='games between early stopping checks')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--map', action='append', dest='maps')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='save the search here, and resume from it')
+    args = parser.parse_args(argv)
+    state = tune(args.bot, args.opponent, args.generations, args.population,
+                 args.games, args.seed, args.maps or [arena.DEFAULT_MAP],
+                 args.jobs, args.checkpoint, args.round)
+    if state['best']:
+        sys.stderr.write(state['best']['best_spec'] + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Keeps a bot running in its own process and asks it for a whole team's
+moves at once
+
+    python -m tools.runner goose fry -n 1000 --worker
+
+The game calls act() once per robot, and every call pays for a little
+bookkeeping before the bot's turn caches kick in. A worker is a
+long-lived process (python -m tools.worker SPEC) that reads one message
+per turn on stdin: the board and the player to move. It runs every one
+of that player's robots through act() and answers with all their
+actions on stdout. Its map tables, path fields, plan caches and world
+models stay warm from turn to turn and match to match.
+
+Messages are pickles, each preceded by its length:
+
+    ('match', map_path, player_id)       -> None
+    ('turn', turn, board, player_id)     -> [(loc, action), ...]
+    ('stats',)                           -> {'acts': n, 'seconds': s}
+
+board is a tuple of (loc, hp, player_id, robot_id). A bot that raises
+is answered with ('error', traceback) and the client raises WorkerError.
+On the game's side, batched(spec) is a robot class that asks its worker
+on the first act() of each turn and hands out the answers after that.
+
+Any NAME=VALUE after the spec is set on the worker's Robot class, e.g.
+PLAN_BUDGET=None to keep the bot's moves off the clock.
+"""
+import ast
+import atexit
+import cPickle as pickle
+import os
+import struct
+import subprocess
+import sys
+import time
+import traceback
+
+from tools import ROOT, arena, boards
+
+LENGTH = struct.Struct('!I')
+
+
+class WorkerError(Exception):
+    pass
+
+
+def send(out, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    out.write(LENGTH.pack(len(data)) + data)
+    out.flush()
+
+
+def receive(inp):
+    """The next message. Raises EOFError once the other side has gone."""
+    header = inp.read(LENGTH.size)
+    if len(header) < LENGTH.size:
+        raise EOFError
+    return pickle.loads(inp.read(LENGTH.unpack(header)[0]))
+
+
+def encode(robots):
+    return tuple((loc, bot.hp, bot.player_id, bot.get('robot_id'))
+                 for loc, bot in robots.items())
+
+
+class Team(object):
+    """The worker's side: one robot object per player, like rgkit's"""
+
+    def __init__(self, spec, pinned=None):
+        self.robot_class = arena.load_bot(spec)
+        if pinned:
+            self.robot_class = type(self.robot_class.__name__,
+                                    (self.robot_class,), dict(pinned))
+        self.robots = {}
+        self.acts = 0
+        self.seconds = 0.0
+
+    def start(self, map_path, player_id):
+        arena.use_map(map_path)
+        self.robots[player_id] = self.robot_class()
+
+    def act_all(self, turn, board, player_id):
+        game = boards.make_game(turn, board)
+        robot = self.robots[player_id]
+        actions = []
+        for loc, bot in sorted(game['robots'].items()):
+            if bot.player_id != player_id:
+                continue
+            for name in ('location', 'hp', 'player_id', 'robot_id'):
+                setattr(robot, name, bot[name])
+            start = time.time()
+            action = robot.act(game)
+            self.seconds += time.time() - start
+            self.acts += 1
+            actions.append((loc, action))
+        return actions
+
+    def stats(self):
+        """How many act() calls so far, and the seconds spent in them"""
+        return {'acts': self.acts, 'seconds': self.seconds}
+
+
+def serve(spec, inp, out, pinned=None):
+    """Answer messages from inp on out until inp is closed"""
+    team = Team(spec, pinned)
+    while True:
+        try:
+            message = receive(inp)
+        except EOFError:
+            return
+        try:
+            if message[0] == 'match':
+                reply = team.start(*message[1:])
+            elif message[0] == 'stats':
+                reply = team.stats()
+            else:
+                reply = team.act_all(*message[1:])
+        except Exception:
+            reply = ('error', traceback.format_exc())
+        send(out, reply)
+
+
+class Worker(object):
+    """The game's side: a running worker process for one bot spec, with
+    the bots from bots_dir instead of bots/ if given, and the Robot class
+    attributes in pinned ({name: value}) overridden"""
+
+    def __init__(self, spec, bots_dir=None, pinned=None):
+        self.spec = spec
+        env = dict(os.environ)
+        if bots_dir:
+            env['RG_BOTS_DIR'] = os.path.abspath(bots_dir)
+        args = ['{k}={v!r}'.format(k=k, v=v)
+                for k, v in sorted((pinned or {}).items())]
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'tools.worker', spec] + args, cwd=ROOT,
+            env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def ask(self, *message):
+        try:
+            send(self.process.stdin, message)
+            reply = receive(self.process.stdout)
+        except (EOFError, IOError):
+            raise WorkerError("{s} worker exited".format(s=self.spec))
+        if isinstance(reply, tuple) and reply[0] == 'error':
+            raise WorkerError(reply[1])
+        return reply
+
+    def start_match(self, map_path, player_id):
+        self.ask('match', map_path, player_id)
+
+    def act_all(self, game, player_id):
+        """{loc: action} for every one of player_id's robots in game"""
+        return dict(self.ask('turn', game['turn'], encode(game['robots']),
+                             player_id))
+
+    def stats(self):
+        return self.ask('stats')
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+
+_workers = {}
+
+
+def worker(spec):
+    """This process's worker for spec, started the first time it's asked"""
+    if spec not in _workers:
+        _workers[spec] = Worker(spec)
+    return _workers[spec]
+
+
+@atexit.register
+def close_all():
+    for w in _workers.values():
+        w.close()
+    _workers.clear()
+
+
+def batched(spec):
+    """A robot class for the game whose moves come from spec's worker"""
+    class Batched(object):
+        def __init__(self):
+            self.worker = worker(spec)
+            self.started = False
+            self.turn = None
+            self.actions = {}
+
+        def act(self, game):
+            if not self.started:
+                self.worker.start_match(os.path.abspath(arena.loaded_map()),
+                                        self.player_id)
+                self.started = True
+            if game['turn'] != self.turn or self.location not in self.actions:
+                self.actions = self.worker.act_all(game, self.player_id)
+                self.turn = game['turn']
+            return self.actions[self.location]
+    return Batched
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or not all('=' in arg for arg in argv[1:]):
+        sys.exit('usage: python -m tools.worker SPEC [NAME=VALUE ...]')
+    pinned = {}
+    for arg in argv[1:]:
+        name, _, value = arg.partition('=')
+        pinned[name] = ast.literal_eval(value)
+    # replies go out on the real stdout, anything the bot prints goes to
+    # stderr instead of into the stream
+    out = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    serve(argv[0], os.fdopen(0, 'rb'), out, pinned)
+
+
+if __name__ == '__main__':
+    main()